@@ -1,4 +1,5 @@
-from struct import pack, unpack
+from operator import itemgetter
+from struct import pack, unpack, Struct
 from .pngexceptions import InvalidChunkStructureException, UnsupportedCompressionMethodException
 from .utils import compress, decompress
 
@@ -7,6 +8,62 @@ from .utils import compress, decompress
 This module contains the core classes that represent the various components of a PNG file.
 """
 
+# Fixed layouts of the IHDR and tIME payloads, read in a single call by get_all
+_IHDR_LAYOUT = Struct('>IIBBBBB')
+_TIME_LAYOUT = Struct('>hBBBBB')
+
+# Multi-byte fields of fixed-length payloads, read and written in place
+_U32 = Struct('>I')
+_U16 = Struct('>H')
+_I16 = Struct('>h')
+_RGB16 = Struct('>HHH')
+_IHDR_SIZE = Struct('>II')
+
+# cHRM fields, in payload order, each one a 4 bytes integer holding the value times 100000
+_CHRM_FIELDS = ('white_x', 'white_y', 'red_x', 'red_y', 'green_x', 'green_y', 'blue_x', 'blue_y')
+_CHRM_OFFSETS = {field: 4 * index for index, field in enumerate(_CHRM_FIELDS)}
+_CHRM_LAYOUT = Struct('>8I')
+
+# IHDR color types, indexed by code: name, allowed bit depths, channel count
+# Padded to cover every possible byte value, so any code read from a payload is a valid index
+_COLOR_TYPES = (
+    ("Greyscale", (1, 2, 4, 8, 16), 1),
+    ("Wrong!!", None, None),
+    ("Truecolour", (8, 16), 3),
+    ("Indexed-colour", (1, 2, 4, 8), 1),
+    ("Greyscale with alpha", (8, 16), 2),
+    ("Wrong!!", None, None),
+    ("Truecolour with alpha", (8, 16), 4)
+) + (("Wrong!!", None, None),) * 249
+
+# Allowed bit depths of each color type, as sets for membership tests
+_COLOR_TYPE_DEPTHS = tuple(
+    frozenset(depths) if depths is not None else frozenset() for _, depths, _ in _COLOR_TYPES
+)
+
+# sRGB rendering intents, indexed by code
+_RENDERING_TYPES = (
+    "Perceptual",
+    "Relative colorimetric",
+    "Saturation",
+    "Absolute colorimetric"
+)
+
+
+def _set_byte(chunk, index, value):
+    """Replaces the single byte at the given index of a chunk's payload."""
+    data = bytearray(chunk.data)
+    data[index] = value
+    chunk.data = data
+
+
+def _pack_field(chunk, layout, offset, *values):
+    """Packs values with the given Struct at an offset of a chunk's payload, replacing what was there."""
+    data = bytearray(chunk.data)
+    layout.pack_into(data, offset, *values)
+    chunk.data = data
+
+
 class ChunkImplementation:
 
     """
@@ -20,8 +77,11 @@ class ChunkImplementation:
 
     The following method may also be overriten in special cases:
         _is_length_valid
+
+    Subclasses should declare the attributes they set in __slots__
     """
-        
+
+    __slots__ = ('type', 'empty_data', 'lengths', 'max_length', 'min_length')
 
     def __init__(self, chunk_type: str, empty_data: bytes = b'',
                  length: (int, list) = None, max_length: int = 1 << 31 - 1, min_length: int = 0):
@@ -200,22 +260,26 @@ class ChunkIHDR(ChunkImplementation):
         interlace: An integer encoding the interlace method
         channel_count The number of color channel in the image (read only)"""
 
+    __slots__ = (
+        '__key_size',
+        '__key_width',
+        '__key_height',
+        '__key_colortype_name',
+        '__key_colortype_code',
+        '__key_colortype_depth',
+        '__key_bit_depth',
+        '__key_compression',
+        '__key_filter_method',
+        '__key_interlace',
+        '__key_channel_count',
+    )
+
     def __init__(self):
         super(ChunkIHDR, self).__init__(
             'IHDR',
             length=13,
             empty_data=b'\x00\x00\x00\x01\x00\x00\x00\x01\x01\x00\x00\x00\x00',
         )
-        # Name, bit depths, channel count
-        self.__color_types = (
-            ("Greyscale", (1, 2, 4, 8, 16), 1),
-            ("Wrong!!", None, None),
-            ("Truecolour", (8, 16), 3),
-            ("Indexed-colour", (1, 2, 4, 8), 1),
-            ("Greyscale with alpha", (8, 16), 2),
-            ("Wrong!!", None, None),
-            ("Truecolour with alpha", (8, 16), 4)
-        )
         self.__key_size = "size"
         self.__key_width = "width"
         self.__key_height = "height"
@@ -229,80 +293,119 @@ class ChunkIHDR(ChunkImplementation):
         self.__key_channel_count = "channel_count"
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
+        width, height, depth, code, compression, filter_method, interlace = _IHDR_LAYOUT.unpack_from(chunk.data)
+        name, depths, channel_count = _COLOR_TYPES[code]
         return {
-            self.__key_size: self.get(chunk, self.__key_size),
-            self.__key_colortype_name: self.get(chunk, self.__key_colortype_name),
-            self.__key_colortype_code: self.get(chunk, self.__key_colortype_code),
-            self.__key_colortype_depth: self.get(chunk, self.__key_colortype_depth),
-            self.__key_bit_depth: self.get(chunk, self.__key_bit_depth),
-            self.__key_compression: self.get(chunk, self.__key_compression),
-            self.__key_filter_method: self.get(chunk, self.__key_filter_method),
-            self.__key_interlace: self.get(chunk, self.__key_interlace),
-            self.__key_channel_count: self.get(chunk, self.__key_channel_count)
+            self.__key_size: (width, height),
+            self.__key_colortype_name: name,
+            self.__key_colortype_code: code,
+            self.__key_colortype_depth: depths,
+            self.__key_bit_depth: depth,
+            self.__key_compression: compression,
+            self.__key_filter_method: filter_method,
+            self.__key_interlace: interlace,
+            self.__key_channel_count: channel_count
         }
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field == self.__key_size:
-            width = unpack('>I', chunk.data[0:4])[0]
-            height = unpack('>I', chunk.data[4:8])[0]
-            return width, height
-        elif field == self.__key_width:
-            return unpack('>I', chunk.data[0:4])[0]
-        elif field == self.__key_height:
-            return unpack('>I', chunk.data[4:8])[0]
-        elif field == self.__key_colortype_name:
-            code = self.get(chunk, self.__key_colortype_code)
-            return self.__color_types[code][0]
-        elif field == self.__key_colortype_code:
-            return unpack('B', chunk.data[9:10])[0]
-        elif field == self.__key_colortype_depth:
-            code = self.get(chunk, self.__key_colortype_code)
-            return self.__color_types[code][1]
-        elif field == self.__key_bit_depth:
-            return unpack('B', chunk.data[8:9])[0]
-        elif field == self.__key_compression:
-            return unpack('B', chunk.data[10:11])[0]
-        elif field == self.__key_filter_method:
-            return unpack('B', chunk.data[11:12])[0]
-        elif field == self.__key_interlace:
-            return unpack('B', chunk.data[12:13])[0]
-        elif field == self.__key_channel_count:
-            code = self.get(chunk, self.__key_colortype_code)
-            return self.__color_types[code][2]
-        else:
-            raise KeyError()
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        return getter(self, chunk)
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field == self.__key_size:
-            self.set(chunk, self.__key_width, value[0])
-            self.set(chunk, self.__key_height, value[1])
-        elif field == self.__key_width:
-            width = pack('>I', value)
-            chunk.data = width + chunk.data[4:]
-        elif field == self.__key_height:
-            height = pack('>I', value)
-            chunk.data = chunk.data[:4] + height + chunk.data[8:]
-        elif field == self.__key_colortype_code:
-            code = pack('B', value)
-            chunk.data = chunk.data[:9] + code + chunk.data[10:]
-        elif field == self.__key_bit_depth:
-            code = pack('B', value)
-            chunk.data = chunk.data[:8] + code + chunk.data[9:]
-        elif field == self.__key_compression:
-            code = pack('B', value)
-            chunk.data = chunk.data[:10] + code + chunk.data[11:]
-        elif field == self.__key_filter_method:
-            code = pack('B', value)
-            chunk.data = chunk.data[:11] + code + chunk.data[12:]
-        elif field == self.__key_interlace:
-            code = pack('B', value)
-            chunk.data = chunk.data[:12] + code + chunk.data[13:]
-        else:
-            raise KeyError()
+        try:
+            setter = self.__SETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        setter(self, chunk, value)
+
+    def __get_size(self, chunk):
+        return self.__get_width(chunk), self.__get_height(chunk)
+
+    def __get_width(self, chunk):
+        return _U32.unpack_from(chunk.data, 0)[0]
+
+    def __get_height(self, chunk):
+        return _U32.unpack_from(chunk.data, 4)[0]
+
+    def __get_colortype_name(self, chunk):
+        return _COLOR_TYPES[self.__get_colortype_code(chunk)][0]
+
+    def __get_colortype_code(self, chunk):
+        return chunk.data[9]
+
+    def __get_colortype_depth(self, chunk):
+        return _COLOR_TYPES[self.__get_colortype_code(chunk)][1]
+
+    def __get_bit_depth(self, chunk):
+        return chunk.data[8]
+
+    def __get_compression(self, chunk):
+        return chunk.data[10]
+
+    def __get_filter_method(self, chunk):
+        return chunk.data[11]
+
+    def __get_interlace(self, chunk):
+        return chunk.data[12]
+
+    def __get_channel_count(self, chunk):
+        return _COLOR_TYPES[self.__get_colortype_code(chunk)][2]
+
+    def __set_size(self, chunk, value):
+        _pack_field(chunk, _IHDR_SIZE, 0, value[0], value[1])
+
+    def __set_width(self, chunk, value):
+        _pack_field(chunk, _U32, 0, value)
+
+    def __set_height(self, chunk, value):
+        _pack_field(chunk, _U32, 4, value)
+
+    def __set_colortype_code(self, chunk, value):
+        _set_byte(chunk, 9, value)
+
+    def __set_bit_depth(self, chunk, value):
+        _set_byte(chunk, 8, value)
+
+    def __set_compression(self, chunk, value):
+        _set_byte(chunk, 10, value)
+
+    def __set_filter_method(self, chunk, value):
+        _set_byte(chunk, 11, value)
+
+    def __set_interlace(self, chunk, value):
+        _set_byte(chunk, 12, value)
+
+    # Built from the plain functions of the class body, instances do not hold bound methods and stay picklable
+    __GETTERS = {
+        'size': __get_size,
+        'width': __get_width,
+        'height': __get_height,
+        'colortype_name': __get_colortype_name,
+        'colortype_code': __get_colortype_code,
+        'colortype_depth': __get_colortype_depth,
+        'bit_depth': __get_bit_depth,
+        'compression': __get_compression,
+        'filter_method': __get_filter_method,
+        'interlace': __get_interlace,
+        'channel_count': __get_channel_count,
+    }
+    __SETTERS = {
+        'size': __set_size,
+        'width': __set_width,
+        'height': __set_height,
+        'colortype_code': __set_colortype_code,
+        'bit_depth': __set_bit_depth,
+        'compression': __set_compression,
+        'filter_method': __set_filter_method,
+        'interlace': __set_interlace,
+    }
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
-        depth = self.get(chunk, self.__key_bit_depth)
-        return depth in self.get(chunk, self.__key_colortype_depth)
+        data = chunk.data
+        return data[8] in _COLOR_TYPE_DEPTHS[data[9]]
 
 
 class ChunkIDAT(ChunkImplementation):
@@ -314,6 +417,8 @@ class ChunkIDAT(ChunkImplementation):
         data: simply returns the raw chunk data
               has to be processed with other IDAT chunks"""
 
+    __slots__ = ('__key_data',)
+
     def __init__(self):
         super(ChunkIDAT, self).__init__('IDAT', min_length=1)
         self.__key_data = 'data'
@@ -322,12 +427,18 @@ class ChunkIDAT(ChunkImplementation):
         return {self.__key_data: self.get(chunk, self.__key_data)}
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field == self.__key_data:
-            return chunk.data
-        else:
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
             raise KeyError(
                 f"Only '{self.__key_data}' key is valid for IHDR chunks"
             )
+        return getter(self, chunk)
+
+    def __get_data(self, chunk):
+        return chunk.data
+
+    __GETTERS = {'data': __get_data}
 
 class ChunktEXt(ChunkImplementation):
     """tEXt chunks contain text information.
@@ -341,6 +452,8 @@ class ChunktEXt(ChunkImplementation):
         text: The actual text
         content: not available from get_all, returns a (keyword, text) tuple"""
 
+    __slots__ = ('__key_keyword', '__key_text')
+
     def __init__(self):
         super(ChunktEXt, self).__init__('tEXt',
                                         empty_data=b'A\x00',
@@ -350,93 +463,103 @@ class ChunktEXt(ChunkImplementation):
         self.__key_text = 'text'
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
-        return {self.__key_keyword: self.get(chunk, self.__key_keyword),
-                self.__key_text: self.get(chunk, self.__key_text)}
+        keyword, text = self.__read(chunk)
+        return {self.__key_keyword: keyword,
+                self.__key_text: text}
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field not in (self.__key_text, self.__key_keyword):
-            raise KeyError()
-        if chunk.data.count(0x00) != 1 or chunk.data.find(0x00) > 78:
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        return getter(self.__read(chunk))
+
+    def __read(self, chunk):
+        data = chunk.data
+        sep = data.find(0x00)
+        if sep == -1 or sep > 78 or data.find(0x00, sep + 1) != -1:
             raise InvalidChunkStructureException(
                 "Invalid number of null byte separator in tEXt chunk"
             )
-        sep = chunk.data.find(0x00)
-        keyword = unpack('{}s'.format(sep), chunk.data[0: sep])[0]
-        keyword = keyword.decode('latin1')
-        textlen = len(chunk.data) - sep - 1
-        text = chunk.data[sep + 1: len(chunk.data)]
-        text = unpack('{}s'.format(textlen), text)[0]
-        text = text.decode('latin1')
-        if field == self.__key_keyword:
-            return text
-        elif field == self.__key_text:
-            return keyword
-        raise KeyError(f"Invalid key for tEXt chunk")
+        keyword = data[:sep].decode('latin1')
+        text = data[sep + 1:].decode('latin1')
+        return keyword, text
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field not in (self.__key_text, self.__key_keyword):
-            raise KeyError()
-        if chunk.data.count(0x00) != 1:
+        try:
+            setter = self.__SETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        data = chunk.data
+        sep = data.find(0x00)
+        if sep == -1 or data.find(0x00, sep + 1) != -1:
             raise InvalidChunkStructureException(
                 "invalid number of null byte separator in tEXt chunk"
             )
-        sep = chunk.data.find(0x00)
-        value = value.encode('latin1')
-        if field == self.__key_text:
-            chunk.data = chunk.data[:sep + 1] + value
-        elif field == self.__key_keyword:
-            chunk.data = value + chunk.data[sep:]
+        setter(self, chunk, value.encode('latin1'), sep)
+
+    def __set_keyword(self, chunk, value, sep):
+        chunk.data = value + chunk.data[sep:]
+
+    def __set_text(self, chunk, value, sep):
+        chunk.data = chunk.data[:sep + 1] + value
+
+    # Getters select their field from the (keyword, text) tuple returned by __read
+    __GETTERS = {
+        'keyword': itemgetter(0),
+        'text': itemgetter(1),
+    }
+    __SETTERS = {
+        'keyword': __set_keyword,
+        'text': __set_text,
+    }
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
-        return chunk.data.count(0x00) == 1 and chunk.data.find(0x00) <= 78
+        data = chunk.data
+        sep = data.find(0x00)
+        return 0 <= sep <= 78 and data.find(0x00, sep + 1) == -1
 
 
 class ChunksRGB(ChunkImplementation):
 
     # TODO Docstring
 
+    __slots__ = ('renderingtypes', '__key_rendering_code', '__key_rendering_name')
+
     def __init__(self):
         super(ChunksRGB, self).__init__('sRGB',
                                         empty_data=b'\x00',
                                         length=1,
                                         )
-        self.renderingtypes = (
-            "Perceptual",
-            "Relative colorimetric",
-            "Saturation",
-            "Absolute colorimetric"
-        )
+        self.renderingtypes = _RENDERING_TYPES
         self.__key_rendering_code = "rendering_code"
         self.__key_rendering_name = "rendering_name"
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
+        code = chunk.data[0]
         return {
-            self.__key_rendering_code: self.get(
-                chunk,
-                self.__key_rendering_code
-            ),
-            self.__key_rendering_name: self.get(
-                chunk,
-                self.__key_rendering_name
-            ),
+            self.__key_rendering_code: code,
+            self.__key_rendering_name: self.__rendering_name(code),
         }
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
         if field == self.__key_rendering_code:
             return chunk.data[0]
         elif field == self.__key_rendering_name:
-            try:
-                return self.renderingtypes[
-                    self.get(chunk, self.__key_rendering_code)
-                ]
-            except KeyError:
-                raise InvalidChunkStructureException('invalid sRGB value')
+            return self.__rendering_name(chunk.data[0])
         else:
             raise KeyError()
 
+    @staticmethod
+    def __rendering_name(code):
+        try:
+            return _RENDERING_TYPES[code]
+        except IndexError:
+            raise InvalidChunkStructureException('invalid sRGB value')
+
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
         if field == self.__key_rendering_code:
-            chunk.data = pack('B', value)
+            chunk.data = bytes((value,))
         else:
             raise KeyError()
 
@@ -448,6 +571,8 @@ class ChunktIME(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunktIME, self).__init__(
             'tIME',
@@ -456,46 +581,82 @@ class ChunktIME(ChunkImplementation):
         )
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
+        year, month, day, hour, minute, second = _TIME_LAYOUT.unpack_from(chunk.data)
         return {
-            'year': self.get(chunk, 'year'),
-            'month': self.get(chunk, 'month'),
-            'day': self.get(chunk, 'day'),
-            'hour': self.get(chunk, 'hour'),
-            'minute': self.get(chunk, 'minute'),
-            'second': self.get(chunk, 'second'),
+            'year': year,
+            'month': month,
+            'day': day,
+            'hour': hour,
+            'minute': minute,
+            'second': second,
         }
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field == 'year':
-            return unpack('>h', chunk.data[0:2])[0]
-        elif field == 'month':
-            return chunk.data[2]
-        elif field == 'day':
-            return chunk.data[3]
-        elif field == 'hour':
-            return chunk.data[4]
-        elif field == 'minute':
-            return chunk.data[5]
-        elif field == 'second':
-            return chunk.data[6]
-        else:
-            raise KeyError()
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        return getter(self, chunk)
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field == 'year':
-            chunk.data = pack('>h', value) + chunk.data[2:]
-        elif field == 'month':
-            chunk.data = chunk.data[:2] + pack('B', value) + chunk.data[3:]
-        elif field == 'day':
-            chunk.data = chunk.data[:3] + pack('B', value) + chunk.data[4:]
-        elif field == 'hour':
-            chunk.data = chunk.data[:4] + pack('B', value) + chunk.data[5:]
-        elif field == 'minute':
-            chunk.data = chunk.data[:5] + pack('B', value) + chunk.data[6:]
-        elif field == 'second':
-            chunk.data = chunk.data[:6] + pack('B', value)
-        else:
-            raise KeyError()
+        try:
+            setter = self.__SETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        setter(self, chunk, value)
+
+    def __get_year(self, chunk):
+        return _I16.unpack_from(chunk.data, 0)[0]
+
+    def __get_month(self, chunk):
+        return chunk.data[2]
+
+    def __get_day(self, chunk):
+        return chunk.data[3]
+
+    def __get_hour(self, chunk):
+        return chunk.data[4]
+
+    def __get_minute(self, chunk):
+        return chunk.data[5]
+
+    def __get_second(self, chunk):
+        return chunk.data[6]
+
+    def __set_year(self, chunk, value):
+        _pack_field(chunk, _I16, 0, value)
+
+    def __set_month(self, chunk, value):
+        _set_byte(chunk, 2, value)
+
+    def __set_day(self, chunk, value):
+        _set_byte(chunk, 3, value)
+
+    def __set_hour(self, chunk, value):
+        _set_byte(chunk, 4, value)
+
+    def __set_minute(self, chunk, value):
+        _set_byte(chunk, 5, value)
+
+    def __set_second(self, chunk, value):
+        _set_byte(chunk, 6, value)
+
+    __GETTERS = {
+        'year': __get_year,
+        'month': __get_month,
+        'day': __get_day,
+        'hour': __get_hour,
+        'minute': __get_minute,
+        'second': __get_second,
+    }
+    __SETTERS = {
+        'year': __set_year,
+        'month': __set_month,
+        'day': __set_day,
+        'hour': __set_hour,
+        'minute': __set_minute,
+        'second': __set_second,
+    }
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
         year = self.get(chunk, 'year')
@@ -526,6 +687,8 @@ class ChunkgAMA(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkgAMA, self).__init__('gAMA',
                                         empty_data=b'\x00\x00\x00\x00',
@@ -538,16 +701,27 @@ class ChunkgAMA(ChunkImplementation):
         }
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field == 'gama':
-            return unpack('>I', chunk.data[0:4])[0] / 100000
-        else:
-            raise KeyError()
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        return getter(self, chunk)
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field == 'gama':
-            chunk.data = pack('>I', int(value * 100000))
-        else:
-            raise KeyError()
+        try:
+            setter = self.__SETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        setter(self, chunk, value)
+
+    def __get_gama(self, chunk):
+        return _U32.unpack_from(chunk.data, 0)[0] / 100000
+
+    def __set_gama(self, chunk, value):
+        chunk.data = _U32.pack(int(value * 100000))
+
+    __GETTERS = {'gama': __get_gama}
+    __SETTERS = {'gama': __set_gama}
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
         return True
@@ -558,6 +732,8 @@ class ChunkzTXt(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkzTXt, self).__init__('zTXt',
                                         empty_data=b'A\x00x\x9c\x03\x00\x00\x00\x00\x01',
@@ -565,57 +741,75 @@ class ChunkzTXt(ChunkImplementation):
                                         )
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
-        return {'text': self.get(chunk, 'text'),
-                'keyword': self.get(chunk, 'keyword'),
-                'compression': self.get(chunk, 'compression')}
+        keyword, compression_code, text = self.__read(chunk)
+        return {'text': text,
+                'keyword': keyword,
+                'compression': compression_code}
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field not in ('text', 'keyword', 'content', 'compression'):
-            raise KeyError()
-        if chunk.data.count(0x00) < 1:
+        try:
+            getter = self.__GETTERS[field]
+        except KeyError:
+            raise KeyError(field)
+        return getter(self.__read(chunk))
+
+    def __read(self, chunk):
+        data = chunk.data
+        sep = data.find(0x00)
+        if sep == -1:
             raise InvalidChunkStructureException("invalid number of null byte separator in zTXt chunk")
-        sep = chunk.data.find(0x00)
-        keyword = unpack('{}s'.format(sep), chunk.data[0: sep])[0].decode('latin1')
-        compression_code = chunk.data[sep + 1]
+        keyword = data[:sep].decode('latin1')
+        compression_code = data[sep + 1]
         if compression_code == 0:
-            text = decompress(chunk.data[sep + 2:])
-            text = unpack('{}s'.format(len(text)), text)[0].decode('latin1')
+            text = decompress(data[sep + 2:]).decode('latin1')
         else:
             raise UnsupportedCompressionMethodException(code=compression_code)
-        if field == 'text':
-            return text
-        elif field == 'keyword':
-            return keyword
-        elif field == 'compression':
-            return compression_code
-        elif field == 'content':
-            return keyword, text
+        return keyword, compression_code, text
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field not in ('text', 'keyword'):
-            raise KeyError()
-        if chunk.data.count(0x00) < 1:
-            raise InvalidChunkStructureException("invalid number of null byte separator in zTXt chunk")
+        try:
+            setter = self.__SETTERS[field]
+        except KeyError:
+            raise KeyError(field)
         sep = chunk.data.find(0x00)
+        if sep == -1:
+            raise InvalidChunkStructureException("invalid number of null byte separator in zTXt chunk")
+        setter(self, chunk, value, sep)
+
+    def __set_keyword(self, chunk, value, sep):
+        chunk.data = value.encode('latin1') + chunk.data[sep:]
+
+    def __set_text(self, chunk, value, sep):
         compression_code = chunk.data[sep + 1]
-        if field == 'text':
-            if compression_code == 0:
-                text = value.encode('latin1')
-                text = compress(text)
-                chunk.data = chunk.data[:sep + 2] + text
-            else:
-                raise UnsupportedCompressionMethodException()
-        elif field == 'keyword':
-            chunk.data = value.encode('latin1') + chunk.data[sep:]
+        if compression_code == 0:
+            text = value.encode('latin1')
+            text = compress(text)
+            chunk.data = chunk.data[:sep + 2] + text
+        else:
+            raise UnsupportedCompressionMethodException()
+
+    # Getters select their field from the (keyword, compression, text) tuple returned by __read
+    __GETTERS = {
+        'keyword': itemgetter(0),
+        'compression': itemgetter(1),
+        'text': itemgetter(2),
+        'content': itemgetter(0, 2),
+    }
+    __SETTERS = {
+        'keyword': __set_keyword,
+        'text': __set_text,
+    }
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
-        return chunk.data.count(0x00) >= 1 and chunk.data.find(0x00) <= 78
+        return 0 <= chunk.data.find(0x00) <= 78
 
 class ChunkcHRM(ChunkImplementation):
 
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkcHRM, self).__init__(
             'cHRM',
@@ -624,64 +818,22 @@ class ChunkcHRM(ChunkImplementation):
         )
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
-        return {
-            'white_x': self.get(chunk, 'white_x'),
-            'white_y': self.get(chunk, 'white_y'),
-            'red_x': self.get(chunk, 'red_x'),
-            'red_y': self.get(chunk, 'red_y'),
-            'green_x': self.get(chunk, 'green_x'),
-            'green_y': self.get(chunk, 'green_y'),
-            'blue_x': self.get(chunk, 'blue_x'),
-            'blue_y': self.get(chunk, 'blue_y'),
-        }
+        values = _CHRM_LAYOUT.unpack_from(chunk.data)
+        return {field: value / 100000 for field, value in zip(_CHRM_FIELDS, values)}
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
-        if field == 'white_x':
-            return unpack('>I', chunk.data[0:4])[0] / 100000
-        elif field == 'white_y':
-            return unpack('>I', chunk.data[4:8])[0] / 100000
-        elif field == 'red_x':
-            return unpack('>I', chunk.data[8:12])[0] / 100000
-        elif field == 'red_y':
-            return unpack('>I', chunk.data[12:16])[0] / 100000
-        elif field == 'green_x':
-            return unpack('>I', chunk.data[16:20])[0] / 100000
-        elif field == 'green_y':
-            return unpack('>I', chunk.data[20:24])[0] / 100000
-        elif field == 'blue_x':
-            return unpack('>I', chunk.data[24:28])[0] / 100000
-        elif field == 'blue_y':
-            return unpack('>I', chunk.data[28:32])[0] / 100000
-        else:
+        try:
+            offset = _CHRM_OFFSETS[field]
+        except KeyError:
             raise KeyError()
+        return _U32.unpack_from(chunk.data, offset)[0] / 100000
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
-        if field == 'white_x':
-            value = pack('>I', round(value * 100000))
-            chunk.data = value + chunk.data[4:]
-        elif field == 'white_y':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:4] + value + chunk.data[8:]
-        elif field == 'red_x':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:8] + value + chunk.data[12:]
-        elif field == 'red_y':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:12] + value + chunk.data[16:]
-        elif field == 'green_x':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:16] + value + chunk.data[20:]
-        elif field == 'green_y':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:20] + value + chunk.data[24:]
-        elif field == 'blue_x':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:24] + value + chunk.data[28:]
-        elif field == 'blue_y':
-            value = pack('>I', round(value * 100000))
-            chunk.data = chunk.data[:28] + value
-        else:
+        try:
+            offset = _CHRM_OFFSETS[field]
+        except KeyError:
             raise KeyError()
+        _pack_field(chunk, _U32, offset, round(value * 100000))
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
         return True
@@ -691,6 +843,8 @@ class ChunkpHYs(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkpHYs, self).__init__(
             'pHYs',
@@ -709,9 +863,9 @@ class ChunkpHYs(ChunkImplementation):
 
     def get(self, chunk, field, ihdr=None, ihdr_data=None):
         if field == 'ppu_x':
-            return unpack('>I', chunk.data[0:4])[0]
+            return _U32.unpack_from(chunk.data, 0)[0]
         elif field == 'ppu_y':
-            return unpack('>I', chunk.data[4:8])[0]
+            return _U32.unpack_from(chunk.data, 4)[0]
         elif field == 'unit_code':
             return chunk.data[8]
         elif field == 'unit_name':
@@ -729,9 +883,9 @@ class ChunkpHYs(ChunkImplementation):
 
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
         if field == 'ppu_x':
-            chunk.data = pack('>I', value) + chunk.data[4:]
+            chunk.data = _U32.pack(value) + chunk.data[4:]
         elif field == 'ppu_y':
-            chunk.data = chunk.data[:4] + pack('>I', value) + chunk.data[8:]
+            chunk.data = chunk.data[:4] + _U32.pack(value) + chunk.data[8:]
         elif field == 'unit_code':
             chunk.data = chunk.data[:8] + pack('B', value)
         elif field == 'dpi':
@@ -748,6 +902,8 @@ class ChunkiTXt(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkiTXt, self).__init__('iTXt',
                                         empty_data=b'A\x00\x00\x00\x00A\x00',
@@ -767,15 +923,13 @@ class ChunkiTXt(ChunkImplementation):
         if field not in ('text', 'keyword', 'compression_code',
                          'compressed', 'language', 'translated_keyword',):
             raise KeyError()
-        if chunk.data.count(b'\x00') < 3:
+        sep1, sep2, sep3 = self.__find_separators(chunk.data)
+        if sep3 == -1:
             raise InvalidChunkStructureException("invalid number of null byte separator in iTXt chunk")
-        sep1 = chunk.data.find(0x00)
         if sep1 > 79:
             raise InvalidChunkStructureException(
                 "iTXt keyword is too long, it should be at most 79 bytes and is {}".format(sep1)
             )
-        sep2 = chunk.data.find(0x00, sep1 + 3)
-        sep3 = chunk.data.find(0x00, sep2 + 1)
         if field == 'keyword':
             return chunk.data[:sep1].decode('latin1')
         elif field == 'language':
@@ -809,6 +963,24 @@ class ChunkiTXt(ChunkImplementation):
         else:
             raise KeyError()
 
+    @staticmethod
+    def __find_separators(data):
+        """
+        Finds the null separators after the keyword, the language tag and the translated keyword.
+        All three are -1 if any of them is missing.
+        The compression flag and method bytes after the keyword are skipped, as they may be null.
+        """
+        sep1 = data.find(0x00)
+        if sep1 == -1:
+            return -1, -1, -1
+        sep2 = data.find(0x00, sep1 + 3)
+        if sep2 == -1:
+            return -1, -1, -1
+        sep3 = data.find(0x00, sep2 + 1)
+        if sep3 == -1:
+            return -1, -1, -1
+        return sep1, sep2, sep3
+
     def set(self, chunk, field, value, ihdr=None, ihdr_data=None):
         sep1 = chunk.data.find(0x00)
         sep2 = chunk.data.find(0x00, sep1 + 3)
@@ -839,7 +1011,8 @@ class ChunkiTXt(ChunkImplementation):
             raise KeyError()
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
-        return chunk.data.count(0x00) >= 3 and chunk.data.find(0x00) <= 78
+        sep1, _, sep3 = self.__find_separators(chunk.data)
+        return sep3 != -1 and sep1 <= 78
 
 
 class ChunkbKGD(ChunkImplementation):
@@ -847,6 +1020,8 @@ class ChunkbKGD(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkbKGD, self).__init__('bKGD',
                                         empty_data=b'\x00',
@@ -871,10 +1046,9 @@ class ChunkbKGD(ChunkImplementation):
             if len(chunk) == 1:
                 return chunk.data[0]
             elif len(chunk) == 2:
-                return unpack('>H', chunk.data)[0]
+                return _U16.unpack(chunk.data)[0]
             elif len(chunk) == 6:
-                return unpack('>H', chunk.data[:2])[0], unpack('>H', chunk.data[2:4])[0], unpack('>H', chunk.data[4:6])[
-                    0]
+                return _RGB16.unpack(chunk.data)
             else:
                 raise InvalidChunkStructureException("Invalid length for a bKGD chunk")
 
@@ -897,7 +1071,7 @@ class ChunkbKGD(ChunkImplementation):
                     raise ValueError("Palette index should be between 0 and 255")
                 chunk.data = pack('B', value)
             elif len(chunk) == 2:
-                chunk.data = pack('>H', value)
+                chunk.data = _U16.pack(value)
             elif len(chunk) == 6:
                 if len(value) != 3:
                     raise ValueError("Backgroud color value should have 3 channels")
@@ -907,7 +1081,7 @@ class ChunkbKGD(ChunkImplementation):
                     elif not (x >= 0 and x <= (1 << 16) - 1):
                         raise ValueError("Palette index should be between 0 and 65535")
                 # Some unsigned shorts were used here, make sure it was a unique mistake
-                chunk.data = pack('>H', value[0]) + pack('>H', value[1]) + pack('>H', value[2])
+                chunk.data = _RGB16.pack(*value)
             else:
                 raise InvalidChunkStructureException("Invalid length for a bKGD chunk")
 
@@ -919,6 +1093,8 @@ class ChunksBIT(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunksBIT, self).__init__('sBIT',
                                         min_length=1,
@@ -996,6 +1172,8 @@ class ChunkPLTE(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunkPLTE, self).__init__('PLTE',
                                         empty_data=b'\x00' * 3,
@@ -1007,10 +1185,11 @@ class ChunkPLTE(ChunkImplementation):
         return len(chunk) % 3 == 0 and super(ChunkPLTE, self)._is_length_valid(chunk)
 
     def get(self, chunk, index, ihdr=None, ihdr_data=None):
-        if not isinstance(index, int) or index < 0 or index > 256:
-            raise IndexError('Palette index should be an integer')
-        p = chunk.data[index * 3: index * 3 + 3]
-        return p[0], p[1], p[2]
+        data = chunk.data
+        if not isinstance(index, int) or index < 0 or index * 3 + 3 > len(data):
+            raise IndexError('Palette index should be an integer within the palette')
+        offset = index * 3
+        return data[offset], data[offset + 1], data[offset + 2]
 
     def set(self, chunk, index, val, ihdr=None, ihdr_data=None):
         if not isinstance(index, int) or index < 0 or index > 256:
@@ -1020,13 +1199,16 @@ class ChunkPLTE(ChunkImplementation):
         for p in val:
             if p > 255 or p < 0:
                 raise ValueError('Color values should be integers between 0 and 255')
-        v = pack('B', val[0]) + pack('B', val[1]) + pack('B', val[2])
-        chunk.data = chunk.data[:index * 3] + v + chunk.data[index * 3 + 3:]
+        data = bytearray(chunk.data)
+        data[index * 3: index * 3 + 3] = bytes(val)
+        chunk.data = data
 
     def get_all(self, chunk, ihdr=None, ihdr_data=None):
         if not self.is_valid(chunk):
             raise InvalidChunkStructureException('Invalid PLTE chunk')
-        return tuple([self.get(chunk, i) for i in range(len(chunk) // 3)])
+        data = chunk.data
+        entries = len(data) // 3
+        return tuple((data[i], data[i + 1], data[i + 2]) for i in range(0, entries * 3, 3))
 
     def _is_payload_valid(self, chunk, ihdr=None, ihdr_data=None):
         raise Exception('Not implemented') # TODO
@@ -1037,6 +1219,8 @@ class ChunksPLT(ChunkImplementation):
     # TODO Docstring
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         # TODO I have a doubt about wether or not the length is correct here, check it.
         super(ChunksPLT, self).__init__('sPLT',
@@ -1066,23 +1250,25 @@ class ChunksPLT(ChunkImplementation):
         if field == 'sample_depth':
             return sample_depth
         elif field == 'palette':
-            l = len(chunk.data[sep + 2:])
-            if (sample_depth == 8 and l % 6 != 0) or (sample_depth == 16 and l % 8 != 0):
+            # Each entry holds four samples and a 2 bytes frequency
+            l = len(chunk.data) - sep - 2
+            if (sample_depth == 8 and l % 6 != 0) or (sample_depth == 16 and l % 10 != 0):
                 raise InvalidChunkStructureException(
                     "The sample depth of the sPLT chunk does not match the number of entries.")
             if sample_depth not in (8, 16):
                 raise InvalidChunkStructureException("Wrong sample depth in sPLT chunk: {}".format(sample_depth))
             clen = 1 if sample_depth == 8 else 2
+            data = chunk.data
             plt = []
             for i in range(0, l, clen * 4 + 2):
                 entry = []
                 if clen == 1:
                     for j in range(i, i + 4):
-                        entry.append(chunk.data[j])
+                        entry.append(data[j])
                 else:
                     for j in range(i, i + 8, 2):
-                        entry.append(unpack('>H', chunk.data[j:j + 2])[0])
-                entry.append(unpack('>H', chunk.data[-2:])[0])
+                        entry.append(_U16.unpack_from(data, j)[0])
+                entry.append(_U16.unpack_from(data, len(data) - 2)[0])
                 plt.append(tuple(entry))
             return tuple(plt)
 
@@ -1136,6 +1322,8 @@ class ChunktRNS(ChunkImplementation):
 
     # TODO Do not hardcode keys
 
+    __slots__ = ()
+
     def __init__(self):
         super(ChunktRNS, self).__init__('tRNS',
                                         empty_data=b'\x00\x00',
@@ -1245,6 +1433,8 @@ class ChunkiCCP(ChunkImplementation):
         profile:        The decompressed profile                (bytes)
     """
 
+    __slots__ = ('__key_profile_name', '__key_compression', '__key_profile', '__keys')
+
     def __init__(self):
         super(ChunkiCCP, self).__init__('iCCP',
                                         empty_data=b'0\x00\x00',  # TODO Default profile
@@ -1347,25 +1537,28 @@ class ChunkiCCP(ChunkImplementation):
             chunk.data = chunk.data[:sep + 2] + compress(value)
 
 
-implementations = {
-    'IHDR': ChunkIHDR(),
-    'PLTE': ChunkPLTE(),
-    'IDAT': ChunkIDAT(),
-    'IEND': ChunkImplementation('IEND', length=0),
-    'tEXt': ChunktEXt(),
-    'sRGB': ChunksRGB(),
-    'tIME': ChunktIME(),
-    'gAMA': ChunkgAMA(),
-    'zTXt': ChunkzTXt(),
-    'cHRM': ChunkcHRM(),
-    'pHYs': ChunkpHYs(),
-    'iTXt': ChunkiTXt(),
-    'bKGD': ChunkbKGD(),
-    'sBIT': ChunksBIT(),
-    'sPLT': ChunksPLT(),
-    'tRNS': ChunktRNS(),
-    'iCCP': ChunkiCCP(),
+_IMPLEMENTATIONS = (
+    ChunkIHDR(),
+    ChunkPLTE(),
+    ChunkIDAT(),
+    ChunkImplementation('IEND', length=0),
+    ChunktEXt(),
+    ChunksRGB(),
+    ChunktIME(),
+    ChunkgAMA(),
+    ChunkzTXt(),
+    ChunkcHRM(),
+    ChunkpHYs(),
+    ChunkiTXt(),
+    ChunkbKGD(),
+    ChunksBIT(),
+    ChunksPLT(),
+    ChunktRNS(),
+    ChunkiCCP(),
     # https://www.hackthis.co.uk/forum/programming-technology/27373-png-idot-chunk
-}
+)
+
+# Keyed by the type each implementation declares, so the two can never disagree
+implementations = {implementation.type: implementation for implementation in _IMPLEMENTATIONS}
 
 # TODO Use bytearrays
@@ -1,13 +1,14 @@
-from struct import unpack, pack
-from typing import Any, Optional, Union, Tuple, get_args
+from struct import Struct
+from typing import Any, Optional, Union, Tuple
 from zlib import crc32 as crc
 
 import stegpng
 from . import chunks
 from .pngexceptions import *
-from .utils import compress, decompress, paeth, as_data, Data as _Data
-from math import ceil, floor
-import requests
+from .utils import compress, decompress, decompress_parts, as_data, Data as _Data
+from .utils import unfilter_sub, unfilter_up, unfilter_average, unfilter_paeth
+from .utils import filter_sub, filter_up, filter_average, filter_paeth
+from itertools import chain
 
 
 """
@@ -19,11 +20,74 @@ _Png = "Png"
 _Chunk = "PngChunk"
 _ScanLine = "ScanLine"
 _PixelPos = Union[tuple[int, int], list[int, int]]
+# The types of _PixelPos, usable with isinstance, which does not accept parameterized generics
+_PIXEL_POS_TYPES = (tuple, list)
 _PixelContent = Union[list, tuple]
+# The exact types accepted for each pixel of a _PixelContent and for each of their channels
+_PIXEL_TYPES = frozenset((tuple, list))
+_CHANNEL_TYPES = frozenset((int,))
 _ScanLineContent = Optional[tuple[int, _PixelContent]]
 
 _PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
+# Width and height, as found at the start of the IHDR payload
+_IHDR_DIMENSIONS = Struct('>II')
+
+# Chunk length and CRC fields
+_U32 = Struct('>I')
+
+# Size of the IDAT chunks written when the image data is replaced
+_IDAT_SIZE = 1 << 16
+_IDAT_TYPE_CRC = crc(b'IDAT')
+
+class _ChunkChanges:
+
+    """
+    Counts the type and length changes of the chunks of a _ChunkList, so that indexes of its chunks by type
+    and chunk addresses can tell they are out of date.
+    Chunks are given this counter rather than the list itself when they are indexed, and increment it when they change.
+    """
+
+    __slots__ = ('types', 'sizes')
+
+    def __init__(self):
+        self.types = 0
+        self.sizes = 0
+
+
+class _ChunkList(list):
+
+    """
+    The list of chunks of a Png.
+    It counts the changes made to it in _version, so that indexes built from its content can tell they are out of date,
+    and the changes made to the chunks it indexed in _changes.
+    """
+
+    __slots__ = ('_version', '_changes')
+
+    def __init__(self, *args):
+        super(_ChunkList, self).__init__(*args)
+        self._version = 0
+        self._changes = _ChunkChanges()
+
+
+def _tracking_change(name):
+    method = getattr(list, name)
+
+    def tracked(self, *args, **kwargs):
+        self._version += 1
+        return method(self, *args, **kwargs)
+
+    tracked.__name__ = name
+    tracked.__doc__ = method.__doc__
+    return tracked
+
+
+for _name in ('append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__iadd__', '__imul__'):
+    setattr(_ChunkList, _name, _tracking_change(_name))
+del _name
+
 # TODO stronger type checks everywhere in here
 # TODO document everything that might raise a read only exception
 
@@ -60,8 +124,22 @@ class Png:
             raise InvalidPngStructureException("missing PNG signature")
         self.__filebytes = filebytes
         self.__chunks = None
+        # Chunks grouped by type, and the versions of the chunk list and chunk types they were computed for
+        self.__chunks_by_type = None
+        self.__chunks_by_type_version = None
+        # Addresses of the chunks keyed by their id, and the versions of the chunk list and chunk sizes they were
+        # computed for
+        self.__chunk_addresses = None
+        self.__chunk_addresses_version = None
         self.__file_end = None
         self.__scanlines = None
+        self.__scanlines_ihdr = None
+        # (PLTE chunk, its version, decoded palette) of the last palette lookup
+        self.__palette = None
+        # (IHDR chunk, its version, (width, height, color type code, channel count)) of the last pixel lookup
+        self.__pixel_format = None
+        # (IDAT chunks, their versions, decompressed data) of the last image data decompression
+        self.__imagedata = None
         self.edit = edit
 
         # True when the bytes changed but the pixels have not been updated yet
@@ -83,14 +161,14 @@ class Png:
         # TODO Handle malformed files with a fancy exception
         decoded_chunks = []
         data = self.__filebytes
+        # Only slice out each chunk, copying the remainder of the file on every iteration is quadratic.
+        # Chunks are given views of the file, so that their bytes are only copied once, into the chunk itself
+        view = memoryview(data)
         start = 8
         end = len(data) - 1
-        data = data[8:]
-        no = -1
         while start <= end:
-            no += 1
-            length = unpack('>I', data[:4])[0]
-            chunk = PngChunk(data[:length + 12])
+            length = _U32.unpack_from(data, start)[0]
+            chunk = PngChunk(view[start:start + length + 12])
             try:
                 chunk_type = chunk.type
             except UnicodeDecodeError:
@@ -99,23 +177,23 @@ class Png:
                 )
             decoded_chunks.append(chunk)
             start += length + 12
-            data = data[length + 12:]
             if chunk_type == 'IEND':  # TODO Make this returns even if there is only garbage data after a non-iend chunk
                 break
-        self.__file_end = data
-        self.__chunks = decoded_chunks
+        self.__file_end = data[start:]
+        self.__chunks = _ChunkList(decoded_chunks)
+        # The new chunk list starts over at version 0, the indexes built from the previous one cannot tell they are stale
+        self.__chunks_by_type = None
+        self.__chunk_addresses = None
 
     @property
     def bytes(self) -> bytes:
         """
         :returns: the raw bytes that make up the PNG file.
         """
-        global _PNG_SIGNATURE
-        b = _PNG_SIGNATURE
-        for chunk in self.chunks:
-            b += chunk.bytes
-        b += self.extra_data
-        return b
+        parts = [_PNG_SIGNATURE]
+        parts.extend(chunk.bytes for chunk in self.chunks)
+        parts.append(self.extra_data)
+        return b''.join(parts)
 
     def save(self, file_name: str) -> None:
         """
@@ -123,7 +201,11 @@ class Png:
         :param file_name: name to save the file as. Will be overwritten if is already exists.
         """
         with _builtin_open(file_name, 'bw') as f:  # Workaround because we have our own open function
-            f.write(self.bytes)
+            # Written chunk by chunk, so the whole file never has to be assembled in memory
+            f.write(_PNG_SIGNATURE)
+            for chunk in self.chunks:
+                f.write(chunk.bytes)
+            f.write(self.extra_data)
 
     def get_original(self) -> _Png:
         """
@@ -162,7 +244,7 @@ class Png:
                 index = len(self.chunks)
             else:
                 index = len(self.chunks) - 1
-        self.__chunks.insert(index, chunk)
+        self.chunks.insert(index, chunk)
 
     def remove_chunk(self, chunk: _Chunk) -> None:
         """
@@ -187,22 +269,39 @@ class Png:
         :returns: the byte address of the given chunk.
         :raises ValueError: if this image does not contain the given chunk.
         """
-        add = len(_PNG_SIGNATURE)
-        if chunk not in self.chunks:
+        chunks = self.chunks
+        version = (chunks._version, chunks._changes.sizes)
+        if self.__chunk_addresses is None or self.__chunk_addresses_version != version:
+            addresses = {}
+            address = len(_PNG_SIGNATURE)
+            for c in chunks:
+                c._watch(chunks._changes)
+                # setdefault keeps the first address of a chunk that appears more than once, like the scan it replaces
+                addresses.setdefault(id(c), address)
+                address += c.size
+            self.__chunk_addresses = addresses
+            self.__chunk_addresses_version = version
+        # Ids are only unique among live objects, but every chunk in the mapping is kept alive by the chunk list
+        try:
+            return self.__chunk_addresses[id(chunk)]
+        except KeyError:
             raise ValueError("chunk not in image")
-        for c in self.chunks:
-            if c is not chunk:
-                add += len(c.bytes)
-            else:
-                break
-        return add
 
     def get_chunks_by_type(self, name: str) -> tuple[_Chunk]:
         """
         :param name: the chunk type to look for (e.g. IHDR).
         :returns: all the chunks of the given type in this image.
         """
-        return tuple(filter(lambda c: c.type == name, self.chunks))
+        chunks = self.chunks
+        version = (chunks._version, chunks._changes.types)
+        if self.__chunks_by_type is None or self.__chunks_by_type_version != version:
+            by_type = {}
+            for chunk in chunks:
+                chunk._watch(chunks._changes)
+                by_type.setdefault(chunk.type, []).append(chunk)
+            self.__chunks_by_type = {t: tuple(c) for t, c in by_type.items()}
+            self.__chunks_by_type_version = version
+        return self.__chunks_by_type.get(name, ())
 
     @property
     def extra_data(self) -> bytes:
@@ -284,33 +383,81 @@ class Png:
         """
         :returns: the compressed data stream inside the IDAT chunks.
         """
-        stream = bytearray()
-        for chunk in self.get_chunks_by_type('IDAT'):
-            stream.extend(chunk.data)
-        return bytes(stream)
+        # Joined in one pass, the total size is known before anything is copied
+        return b''.join([chunk.data for chunk in self.get_chunks_by_type('IDAT')])
 
     @property
     def imagedata(self) -> bytes:
-        # TODO setter
-        # TODO have a cache for that
         """
         :returns: the raw decompressed data from the IDAT chunks.
-        """
-        return decompress(self.datastream)
+            It is only decompressed again once the IDAT chunks have changed.
+        """
+        idats = self.get_chunks_by_type('IDAT')
+        versions = tuple(chunk._version for chunk in idats)
+        cached = self.__imagedata
+        if cached is not None and cached[0] == idats and cached[1] == versions:
+            return cached[2]
+        if len(idats) == 1:
+            data = decompress(idats[0].data, self.__imagedata_size())
+        else:
+            # Each IDAT is fed to the decompressor in turn, rather than first copying them all into one stream
+            data = decompress_parts(chunk.data for chunk in idats)
+        self.__imagedata = (idats, versions, data)
+        return data
+
+    def __imagedata_size(self):
+        """
+        :returns: the size the decompressed image data should have according to the IHDR chunk,
+            or None if it cannot be determined.
+        """
+        chunks = self.chunks
+        if not chunks or chunks[0].type != 'IHDR' or len(chunks[0].data) != 13:
+            return None
+        ihdr = chunks[0]
+        channel_count = ihdr['channel_count']
+        if channel_count is None or ihdr['interlace'] != 0:
+            return None
+        width, height = ihdr['size']
+        return height * (((width * ihdr['bit_depth'] * channel_count + 7) >> 3) + 1)
 
     @imagedata.setter
     def imagedata(self, data: _Data):
+        """
+        Compresses the given data and replaces the IDAT chunks with new ones holding the compressed stream.
+        The new chunks take the place of the first previous IDAT chunk, or are placed before IEND if there was none,
+        after the last chunk if there is no IEND either.
+
+        :param data: the new raw image data, made of filtered scanlines.
+        """
         data = compress(data)
-        j = 0
-        for i, chunk in enumerate(self.chunks):
-            if chunk.type == "IDAT":
-                j = i
-                l = len(chunk.data)
-                chunk.data = data[:l]
-                data = data[l:]
-        c = stegpng.create_empty_chunk("IDAT")
-        c.data = data
-        self.chunks.insert(j + 1, c)
+        chunks = self.chunks
+        kept = []
+        position = None
+        end = None
+        for chunk in chunks:
+            ctype = chunk.type
+            if ctype == 'IDAT':
+                if position is None:
+                    position = len(kept)
+            else:
+                if ctype == 'IEND' and end is None:
+                    end = len(kept)
+                kept.append(chunk)
+        if position is None:
+            # Without IEND the chunks go last, they are never put ahead of the IHDR chunk in either case
+            position = max(len(kept) if end is None else end, min(len(kept), 1))
+        # Each chunk is assembled with its header and CRC at once rather than by editing an empty chunk
+        idats = []
+        for start in range(0, len(data), _IDAT_SIZE):
+            part = bytes(data[start:start + _IDAT_SIZE])
+            idats.append(PngChunk(b''.join((
+                _U32.pack(len(part)),
+                b'IDAT',
+                part,
+                _U32.pack(crc(part, _IDAT_TYPE_CRC))
+            ))))
+        kept[position:position] = idats
+        chunks[:] = kept
 
     @property
     def scanlines(self) -> tuple[_ScanLine]:
@@ -322,6 +469,7 @@ class Png:
         :returns: the scanlines of the image, as a tuple of scanlines, ordered from top to bottom order.
         :raises InvalidPngStructureException: if this image is missing an IHDR chunk,
             or if the interlace method is not supported.
+        :raises UnsupportedFilterTypeException: if a scanline uses an unknown filter type.
         """
         ihdr = self.__get_ihdr()
         if ihdr['interlace'] != 0:
@@ -329,7 +477,8 @@ class Png:
             raise InvalidPngStructureException('Invalid interlace method: {}'.format(ihdr['interlace']))
         if not self.__scanlines:
             depth = ihdr['bit_depth']
-            if depth not in ihdr['colortype_depth']:
+            allowed_depths = ihdr['colortype_depth']
+            if allowed_depths is None or depth not in allowed_depths:
                 raise InvalidPngStructureException(
                     'Bit depth of {} is not allowed for color type {}'.format(
                         depth,
@@ -341,29 +490,31 @@ class Png:
             width, height = self.size
             channel_count = ihdr['channel_count']
             data = self.imagedata
-            linesize = width * ceil(depth / 8 * channel_count) + 1
+            # Bits are packed without padding between pixels, only the end of each scanline is padded to a byte
+            stride = (width * depth * channel_count + 7) >> 3
+            linesize = stride + 1
+            # All the complete scanlines are unfiltered at once, each one from the one decoded just before
+            unfiltered = unfilter_image(data, stride, (depth * channel_count + 7) >> 3)
 
             # The first scanline is the only one which can't have reference to its upper pixels,
-            # so we compute it first
-            lines = [ScanLine(channel_count,
-                              depth,
-                              None,
-                              data=data[0:linesize],
-                              edit=self.edit
-                              ),
-                     ]
-            i = 1
-            while (i + 1) * linesize <= len(data):
-                s = ScanLine(
+            # it is always created, even if the data is too short
+            count = max(1, len(data) // linesize)
+            lines = [None] * count
+            previous = None
+            for i in range(count):
+                start = i * linesize
+                previous = lines[i] = ScanLine(
                     channel_count,
                     depth,
-                    lines[i - 1],
-                    data=data[i * linesize:(i + 1) * linesize]
+                    previous,
+                    data=data[start:start + linesize],
+                    edit=self.edit,
+                    unfiltered=unfiltered[i] if i < len(unfiltered) else None
                 )
-                lines.append(s)
-                i += 1
-            self.__scanlines = lines
-        return tuple(self.__scanlines)
+            self.__scanlines = tuple(lines)
+        # The IHDR chunk the checks above passed for, the scanlines can be used without them while it is unchanged
+        self.__scanlines_ihdr = (ihdr, ihdr._version)
+        return self.__scanlines
 
     def getpixel(self, position: tuple[int, int]) -> Tuple[int, ...]:
         """
@@ -376,24 +527,92 @@ class Png:
         :raises IndexError: if position does not fit in the image dimensions.
         """
         x, y = self.__validate_pixel_pos(position)
-        ihdr = self.__get_ihdr()
-        scanline = self.scanlines[y]
-        p = scanline.pixels[x]
+        _, _, colortype_code, channel_count = self.__get_pixel_format()
+        # The scanlines are looked up through the property (and its checks) again whenever the IHDR chunk changed
+        checked = self.__scanlines_ihdr
+        ihdr = self.chunks[0]
+        if self.__scanlines and checked is not None and checked[0] is ihdr and checked[1] == ihdr._version:
+            scanlines = self.__scanlines
+        else:
+            scanlines = self.scanlines
+        p = scanlines[y].pixels[x]
 
         # Indexed color
-        if ihdr['colortype_code'] == 3:
-            plte = self.get_chunks_by_type('PLTE')
-            if len(plte) == 0:
-                raise InvalidPngStructureException('Missing a PLTE chunk')
-            plte = plte[0]  # TODO Optimize this
-            p = p[0]
-            p = plte[p]
+        if colortype_code == 3:
+            try:
+                p = self.__get_palette()[p[0]]
+            except IndexError:
+                raise IndexError('Palette index {} is out of the palette'.format(p[0]))
 
-        if ihdr['channel_count'] == 1 and ihdr['colortype_code'] != 3:
+        if channel_count == 1 and colortype_code != 3:
             p = p[0]
 
         return p
 
+    @property
+    def pixels(self) -> tuple[tuple[Any, ...], ...]:
+        """
+        Decodes all the pixels of the image at once, which is much faster than calling :func:`getpixel` for each of them.
+
+        :returns: the rows of the image, ordered from top to bottom,
+            each one a tuple of pixels in the same form as returned by :func:`getpixel`.
+        :raises InvalidPngStructureException: if this image is missing a critical chunk necessary for pixel decoding.
+        :raises IndexError: if the image data does not cover the whole image,
+            or if a palette index is out of the palette.
+        """
+        width, height, colortype_code, channel_count = self.__get_pixel_format()
+        scanlines = self.scanlines
+        if len(scanlines) < height:
+            raise IndexError('The image data only has {} scanlines out of {}'.format(len(scanlines), height))
+        palette = self.__get_palette() if colortype_code == 3 else None
+        rows = []
+        for scanline in scanlines[:height]:
+            row = scanline.pixels[:width]
+            if len(row) < width:
+                raise IndexError('A scanline only has {} pixels out of {}'.format(len(row), width))
+            if palette is not None:
+                try:
+                    row = tuple([palette[p[0]] for p in row])
+                except IndexError:
+                    index = next(p[0] for p in row if p[0] >= len(palette))
+                    raise IndexError('Palette index {} is out of the palette'.format(index))
+            elif channel_count == 1:
+                row = tuple([p[0] for p in row])
+            rows.append(row)
+        return tuple(rows)
+
+    def __get_palette(self):
+        """
+        :returns: the entries of the image's palette, as (red, green, blue) tuples.
+            They are decoded once and reused for as long as the PLTE chunk is not changed or replaced.
+        :raises InvalidPngStructureException: if the image does not have a PLTE chunk.
+        """
+        plte = self.get_chunks_by_type('PLTE')
+        if len(plte) == 0:
+            raise InvalidPngStructureException('Missing a PLTE chunk')
+        plte = plte[0]
+        cached = self.__palette
+        if cached is None or cached[0] is not plte or cached[1] != plte._version:
+            data = plte.data
+            entries = iter(data[:len(data) - len(data) % 3])
+            cached = self.__palette = (plte, plte._version, tuple(zip(entries, entries, entries)))
+        return cached[2]
+
+    def __get_pixel_format(self):
+        """
+        :returns: the width, height, color type code and channel count of the image, as a tuple.
+            They are decoded once and reused for as long as the IHDR chunk is not changed or replaced.
+        :raises InvalidPngStructureException: if this image is missing an IHDR chunk.
+        """
+        ihdr = self.__get_ihdr()
+        cached = self.__pixel_format
+        if cached is None or cached[0] is not ihdr or cached[1] != ihdr._version:
+            width, height = ihdr['size']
+            cached = self.__pixel_format = (
+                ihdr, ihdr._version, (width, height, ihdr['colortype_code'], ihdr['channel_count'])
+            )
+        return cached[2]
+
     def __get_ihdr(self):
         if len(self.chunks) < 1 or self.chunks[0].type != 'IHDR':
             raise InvalidPngStructureException(
@@ -402,12 +621,12 @@ class Png:
         return self.chunks[0]
 
     def __validate_pixel_pos(self, position):
-        if not isinstance(position, get_args(_PixelPos)):
+        if not isinstance(position, _PIXEL_POS_TYPES):
             raise TypeError('pixel position should be a tuple or a list: tuple(x, y)')
         if len(position) != 2:
             raise ValueError('pixel position should only contain 2 values: tuple(x, y)')
         x, y = position
-        width, height = self.size
+        width, height, _, _ = self.__get_pixel_format()
         if x >= width:
             raise IndexError(
                 'the image has a width of {} but an x position of {} was given'.format(
@@ -423,10 +642,7 @@ class Png:
         return x, y
 
     def recalculate_image_data(self):
-        b = bytearray()
-        for scanline in self.scanlines:
-            b += scanline.data
-        self.imagedata = b
+        self.imagedata = b''.join([scanline.data for scanline in self.scanlines])
 
 class PngChunk:
 
@@ -447,15 +663,33 @@ class PngChunk:
         Creates a PngChunk from the bytes given in the chunkbytes parameter.
         To create a new, empty chunk, use the :func:`create_empty_chunk` function.
 
-        :param chunkbytes: the raw bytes of the chunk.
+        :param chunkbytes: the raw bytes of the chunk, a memoryview is accepted as well and only copied once.
             If to much data is given everything not in the range specified in the length header will be ignored.
         :param edit: whether to allow this chunk object to be modified afterward.
         :param auto_update: if this is true, the chunk's CRC is updated automatically when the chunk's content changes.
         :raises TypeError: if the data is not of a valid type.
         """
         # TODO raise exception if data len is invalid
-        self.__bytes = as_data(chunkbytes)
-        self.__bytes = self.__bytes[:self.length + 12]
+        # The bytes are copied into the chunk's own buffer below, so mutable sources do not need a defensive copy
+        if not isinstance(chunkbytes, (bytearray, memoryview)):
+            chunkbytes = as_data(chunkbytes)
+        self.__length = _U32.unpack_from(chunkbytes)[0]
+        # Kept mutable so that setters can patch fields in place instead of rebuilding the whole chunk
+        self.__bytes = bytearray(memoryview(chunkbytes)[:self.__length + 12])
+        # The type and CRC are decoded on first access, so that an invalid type only raises when it is read
+        self.__type = None
+        self.__crc = None
+        # CRC of the type field, which every CRC computation starts with
+        self.__type_crc = None
+        # True when the content changed and the CRC should be recomputed before it is next read
+        self.__crc_pending = False
+        self.__version = 0
+        # (version, CRC) of the last CRC computation, so that checking an unchanged chunk does not hash it again
+        self.__computed_crc = None
+        # Chunk implementation for this type, looked up on first use
+        self.__implementation = None
+        # Change counters of the chunk lists that indexed this chunk, see _watch
+        self.__watchers = ()
         self.edit = edit
         self.auto_update = auto_update
         self.__dirty = False
@@ -469,22 +703,55 @@ class PngChunk:
             raise Exception("Trying to edit read-only png!")
         else:
             if update_crc:
-                self.update_crc()
+                # Deferred until the CRC or the bytes are read, so that successive edits only compute it once
+                self.__crc_pending = True
             self.__dirty = True
+            self.__version += 1
+
+    @property
+    def _version(self) -> int:
+        """
+        :returns: a counter that changes whenever this chunk is edited,
+            used to tell when values decoded from it are out of date.
+        """
+        return self.__version
+
+    def _watch(self, changes: _ChunkChanges) -> None:
+        """
+        Makes this chunk count its type and length changes in the given counter, from now on.
+
+        :param changes: the change counter of a chunk list indexing this chunk.
+        """
+        if not any(watcher is changes for watcher in self.__watchers):
+            self.__watchers += (changes,)
+
+    def __apply_pending_crc(self):
+        """
+        Writes the up to date CRC if a change requested it.
+        """
+        if self.__crc_pending:
+            value = self.compute_crc()
+            _U32.pack_into(self.__bytes, len(self.__bytes) - 4, value)
+            self.__crc = value
+            self.__crc_pending = False
 
     @property
     def bytes(self) -> bytes:
         """
         :returns: this chunk's raw content.
         """
-        return self.__bytes
+        self.__apply_pending_crc()
+        return bytes(self.__bytes)
 
     @property
     def crc(self) -> int:
         """
         :returns: the chunk's CRC checksum, decoded.
         """
-        return unpack('!I', self.__bytes[-4:])[0]
+        self.__apply_pending_crc()
+        if self.__crc is None:
+            self.__crc = _U32.unpack_from(self.__bytes, len(self.__bytes) - 4)[0]
+        return self.__crc
 
     @crc.setter
     def crc(self, value: int) -> None:
@@ -498,14 +765,18 @@ class PngChunk:
         if not isinstance(value, int):
             raise TypeError("The crc should be an integer.")
         self.__changing(update_crc=False)
-        self.__bytes = self.bytes[:-4] + pack('!I', value)
+        _U32.pack_into(self.__bytes, len(self.__bytes) - 4, value)
+        self.__crc = value
+        self.__crc_pending = False
 
     @property
     def type(self) -> str:
         """
         :returns: the type of this chunk (E.g. IHDR)
         """
-        return self.__bytes[4:8].decode('ascii')
+        if self.__type is None:
+            self.__type = self.__bytes[4:8].decode('ascii')
+        return self.__type
 
     @type.setter
     def type(self, value: str) -> None:
@@ -521,7 +792,12 @@ class PngChunk:
             raise TypeError("A chunk's type should be a string.")
         if len(value) != 4:
             raise ValueError("A chunk's type have to be 4 characters long.")
-        self.__bytes = self.__bytes[0:4] + value.encode('ascii') + self.__bytes[8:]
+        self.__bytes[4:8] = value.encode('ascii')
+        self.__type = value
+        self.__implementation = None
+        for changes in self.__watchers:
+            changes.types += 1
+        self.__type_crc = None
         self.__changing(self.auto_update)
 
     def __len__(self) -> int:
@@ -535,14 +811,21 @@ class PngChunk:
         """
         :returns: the length of this chunk.
         """
-        return unpack('>I', self.__bytes[0:4])[0]
+        return self.__length
+
+    @property
+    def size(self) -> int:
+        """
+        :returns: the number of bytes this chunk takes in the file, including its header and CRC.
+        """
+        return len(self.__bytes)
 
     @property
     def data(self) -> bytes:
         """
         :returns: this chunk's payload.
         """
-        return self.bytes[8:-4]
+        return bytes(memoryview(self.__bytes)[8:-4])
 
     @data.setter
     def data(self, data: bytes) -> None:
@@ -554,7 +837,7 @@ class PngChunk:
         """
         data = as_data(data)
         self.__changing(update_crc=False)
-        self.__bytes = self.__bytes[0:8] + data + self.__bytes[-4:]
+        self.__bytes[8:-4] = data
         self.__update_length()
         self.__changing(self.auto_update)
 
@@ -562,7 +845,11 @@ class PngChunk:
         length = len(self.__bytes) - 12
         if length < 0:
             raise Exception("Trying to update the length of a chunk, but it's smaller than 0!")
-        self.__bytes = pack('>I', length) + self.__bytes[4:]
+        _U32.pack_into(self.__bytes, 0, length)
+        if length != self.__length:
+            for changes in self.__watchers:
+                changes.sizes += 1
+        self.__length = length
 
     def check_crc(self) -> bool:
         """
@@ -575,7 +862,15 @@ class PngChunk:
         Compute the CRC checksum for this chunk.
         :returns: the correct CRC checksum for this chunk.
         """
-        return crc(self.__bytes[4:-4])
+        computed = self.__computed_crc
+        if computed is not None and computed[0] == self.__version:
+            return computed[1]
+        if self.__type_crc is None:
+            self.__type_crc = crc(self.__bytes[4:8])
+        # Continues from the type's CRC over a view of the payload, so the payload is not copied
+        value = crc(memoryview(self.__bytes)[8:-4], self.__type_crc)
+        self.__computed_crc = (self.__version, value)
+        return value
 
     def update_crc(self) -> None:
         """
@@ -590,13 +885,13 @@ class PngChunk:
             A PNG decoder coming accros a critical chunk it doesn't know about should produce an error.
             The PNG specification includes 4 critical chunks: IHDR, PLTE, IDAT and IEND.
         """
-        return (self.__bytes[4] & 0b000010000) >> 4 == 0
+        return not self.__bytes[4] & 0x20
 
     def isancillary(self) -> bool:
         """
         :returns: whether this chunk is not a critical chunk.
         """
-        return (self.__bytes[4] & 0b000010000) >> 4 == 1
+        return bool(self.__bytes[4] & 0x20)
 
     def is_supported(self) -> bool:
         """
@@ -612,10 +907,12 @@ class PngChunk:
         return self.__get_implementation().is_valid(self)
 
     def __get_implementation(self):
-        if not self.is_supported():
-            raise UnsupportedChunkException()
-        global _supported_chunks
-        return _supported_chunks[self.type]
+        if self.__implementation is None:
+            if not self.is_supported():
+                raise UnsupportedChunkException()
+            global _supported_chunks
+            self.__implementation = _supported_chunks[self.type]
+        return self.__implementation
 
     def getitem(self, key: str, ihdr: _Chunk = None, ihdrdata: dict[str, Any] = None) -> Any:
         """
@@ -684,7 +981,8 @@ class ScanLine:
     """
 
     def __init__(self, channelcount: int, bitdepth: int, previous: Optional[_ScanLine],
-                 data: _Data = None, content: _ScanLineContent = None, edit: bool = True, png: Png = None) -> None:
+                 data: _Data = None, content: _ScanLineContent = None, edit: bool = True, png: Png = None,
+                 unfiltered: _Data = None) -> None:
 
         """
         :param channelcount: number of color channels in the image.
@@ -694,6 +992,8 @@ class ScanLine:
         :param content: the decoded content for this scanline, in the (int filter type, list/tuple pixels) format.
             Either this or data has to not be None.
         :param edit: whether to mark that scanline as read-only.
+        :param unfiltered: the unfiltered content matching data, if it is already known, so it is not decoded again.
+            Ignored if data is None.
         """
 
         # Types and value checks
@@ -737,7 +1037,14 @@ class ScanLine:
         self.edit = edit
         self.channelcount = channelcount
         self.bitdepth = bitdepth
-        self.__unfiltered_dirty = True
+        if data is not None and unfiltered is not None:
+            self.__unfiltered = as_data(unfiltered)
+            self.__unfiltered_dirty = False
+        else:
+            self.__unfiltered_dirty = True
+        # (first, last + 1) indices of the unfiltered bytes that changed since data was last in sync with them,
+        # or None if data has to be filtered again as a whole when dirty
+        self.__dirty_range = None
         self._previous = previous
 
     @property
@@ -754,6 +1061,7 @@ class ScanLine:
         """
         # TODO check valid values
         self.__channelcount = value
+        self.__bpp = None
 
     @property
     def bitdepth(self) -> int:
@@ -769,6 +1077,16 @@ class ScanLine:
         """
         # TODO check valid values
         self.__bitdepth = value
+        self.__bpp = None
+
+    @property
+    def _bpp(self) -> int:
+        """
+        :returns: the number of bytes per complete pixel, rounded up to one, used as the filters' pixel offset.
+        """
+        if self.__bpp is None:
+            self.__bpp = (self.channelcount * self.bitdepth + 7) >> 3
+        return self.__bpp
 
     @property
     def filtertype(self) -> int:
@@ -776,7 +1094,9 @@ class ScanLine:
         :returns: the filter code for this scanline.
         """
         if self.__filtertype_dirty:
-            self.__filtertype = self.data[0]
+            # Read from the stored bytes rather than from data, which needs the filter type when it has to be refiltered.
+            # Their first byte is only stale once the filter type has been set, which clears this flag
+            self.__filtertype = self.__data[0]
             self.__filtertype_dirty = False
         return self.__filtertype
 
@@ -793,7 +1113,9 @@ class ScanLine:
             raise TypeError("Filter type should be an integer")
         b = self.unfiltered # Force decode the unfiltered data if needed
         self.__filtertype = val
+        self.__filtertype_dirty = False
         self.__data_dirty = True
+        self.__dirty_range = None
 
     @property
     def unfiltered(self) -> bytes:
@@ -802,49 +1124,28 @@ class ScanLine:
         """
         if self.__unfiltered_dirty:
             if not self.__data_dirty:
-                workingsize = ceil(self.channelcount * self.bitdepth / 8)
-                unfiltered = bytearray()
+                filtertype = self.filtertype
 
-                if self.filtertype == 0:
+                if filtertype == 0:
                     unfiltered = self.data[1:]
                 else:
-                    for index, byte in enumerate(self.data[1:]):
-
-                        # b or c will be set to 0 if not required by the filter type
-                        # This is done to avoid unneeded computation,
-                        # as they require the previous scanline to be also decoded
-                        if index < workingsize:
-                            a = 0
-                        else:
-                            a = unfiltered[index - workingsize]
-                        if self._previous is None or self.filtertype not in (2, 3, 4):
-                            b = 0
-                        else:
-                            b = self._previous.unfiltered[index]
-                        if index < workingsize or self._previous is None or self.filtertype != 4:
-                            c = 0
-                        else:
-                            c = self._previous.unfiltered[index - workingsize]
-
-                        if self.filtertype == 1:
-                            unfiltered.append((byte + a) % 256)
-                        elif self.filtertype == 2:
-                            unfiltered.append((byte + b) % 256)
-                        elif self.filtertype == 3:
-                            unfiltered.append((byte + floor((a + b) / 2)) % 256)
-                        elif self.filtertype == 4:
-                            unfiltered.append((byte + paeth(a, b, c)) % 256)
-                        else:
-                            raise UnsupportedFilterTypeException(code=self.filtertype)
+                    try:
+                        unfilter = _UNFILTERS[filtertype]
+                    except KeyError:
+                        raise UnsupportedFilterTypeException(code=filtertype)
+                    line = self.data[1:]
+                    # The first scanline is reconstructed as if it followed a line of zeros.
+                    # The Sub filter does not need the previous scanline,
+                    # so it is not decoded to avoid unneeded computation
+                    if self._previous is None or filtertype == 1:
+                        previous = bytes(len(line))
+                    else:
+                        previous = self._previous.unfiltered
+                    unfiltered = unfilter(line, previous, self._bpp)
                 self.__unfiltered = bytes(unfiltered)
             elif not self.__pixels_dirty:
-                unfiltered = bytearray()
-
                 if self.bitdepth == 8:
-                    for pixel in self.pixels:
-                        for value in pixel:
-                            unfiltered.append(value)
-                    self.__unfiltered = bytes(unfiltered)
+                    self.__unfiltered = bytes(chain.from_iterable(self.pixels))
                 else:
                     # TODO
                     raise NotImplementedError('Only a bit depth of 8 is supported yet')
@@ -866,8 +1167,10 @@ class ScanLine:
                 "Trying to set the unfiltered scanline with a length of the {} bytes, but the current one has a length of {}".format(
                     len(value), len(self.unfiltered))
             )
-        self.__unfiltered = value
-        self.__data_dirty = True
+        if not self.__data_dirty or self.__dirty_range is not None:
+            self.__replace_unfiltered(value)
+        else:
+            self.__unfiltered = value
         self.__pixels_dirty = True
 
     @property
@@ -876,14 +1179,11 @@ class ScanLine:
         :returns: this scanline's pixel, decoded.
         """
         if self.__pixels_dirty:
-            pixels = []
-            pixel = []
             if self.bitdepth == 8:
-                for byte in self.unfiltered:
-                    pixel.append(byte)
-                    if len(pixel) == self.channelcount:
-                        pixels.append(tuple(pixel))
-                        pixel = []
+                # Each pixel is made of one byte from each channel, zip drops any incomplete trailing pixel
+                unfiltered = self.unfiltered
+                channelcount = self.channelcount
+                pixels = zip(*[unfiltered[index::channelcount] for index in range(channelcount)])
             else:
                 raise NotImplementedError()
             # TODO ===================================================================
@@ -902,25 +1202,68 @@ class ScanLine:
             self.__checkpixels_args(value)
         except Exception as e:
             raise e
+        # When data is in sync with the current unfiltered bytes (apart from an already known range),
+        # only the bytes that actually changed will have to be filtered again
+        in_sync = not self.__unfiltered_dirty and (not self.__data_dirty or self.__dirty_range is not None)
         self.__pixels = value
+        self.__pixels_dirty = False
+        if in_sync and self.bitdepth == 8:
+            self.__replace_unfiltered(bytes(chain.from_iterable(value)))
+        else:
+            self.__data_dirty = True
+            self.__dirty_range = None
+            self.__unfiltered_dirty = True
+
+    def __replace_unfiltered(self, unfiltered):
+        """Replaces the unfiltered bytes, with data in sync with the previous ones,
+        recording the range of bytes that changed so data only has to be filtered again there."""
+        previous = self.__unfiltered
+        self.__unfiltered = unfiltered
+        length = len(unfiltered)
+        if len(previous) != length:
+            self.__data_dirty = True
+            self.__dirty_range = None
+            return
+        # The first and last differing bytes are found from the highest and lowest set bits of the XOR of both lines
+        difference = int.from_bytes(previous, 'big') ^ int.from_bytes(unfiltered, 'big')
+        if not difference:
+            return
+        first = length - 1 - (difference.bit_length() - 1) // 8
+        last = length - ((difference & -difference).bit_length() - 1) // 8
+        if self.__dirty_range is not None:
+            first = min(first, self.__dirty_range[0])
+            last = max(last, self.__dirty_range[1])
+        self.__dirty_range = (first, last)
         self.__data_dirty = True
-        self.__unfiltered_dirty = True
+
+    def channel(self, index: int) -> bytes:
+        """
+        Reads a single channel of every pixel in this scanline at once.
+
+        :param index: the index of the channel, e.g. 3 for the alpha channel of a truecolour with alpha image.
+        :returns: the values of that channel for every pixel in the scanline, from left to right.
+        :raises IndexError: if the index does not match a channel of this scanline.
+        """
+        if self.bitdepth != 8:
+            raise NotImplementedError('Only a bit depth of 8 is supported yet')
+        if not 0 <= index < self.channelcount:
+            raise IndexError('Channel index {} is out of range for {} channels'.format(index, self.channelcount))
+        # Channels are interleaved, so each one is a strided slice of the unfiltered bytes
+        return self.unfiltered[index::self.channelcount]
 
     def __checkpixels_args(self, pixels):
-        """Used to verify that a pixels argument is valid"""
-        l = None
-        for pixel in pixels:
-            if type(pixel) not in (list, tuple):
-                raise TypeError('pixels should be tuples or lists, not {}'.format(type(pixel)))
-            elif l == None:
-                l = len(pixel)
-            elif len(pixel) != l:
-                raise ValueError('All pixels should have the same length')
-            else:
-                for channel in pixel:
-                    if type(channel) != int:
-                        raise TypeError(
-                            'pixels should contain integers only, not {}'.format(type(channel)))
+        """Used to verify that a pixels argument is valid.
+        The types and lengths of all the pixels are collected at once,
+        the offending value is only looked for when one is wrong."""
+        if not _PIXEL_TYPES.issuperset(map(type, pixels)):
+            pixel = next(pixel for pixel in pixels if type(pixel) not in _PIXEL_TYPES)
+            raise TypeError('pixels should be tuples or lists, not {}'.format(type(pixel)))
+        if len(set(map(len, pixels))) > 1:
+            raise ValueError('All pixels should have the same length')
+        if not _CHANNEL_TYPES.issuperset(map(type, chain.from_iterable(pixels))):
+            channel = next(channel for channel in chain.from_iterable(pixels) if type(channel) is not int)
+            raise TypeError(
+                'pixels should contain integers only, not {}'.format(type(channel)))
         return True
 
     @property
@@ -928,42 +1271,30 @@ class ScanLine:
         """
         :returns: this scanline's raw data
         """
-        if self.__data_dirty:
-            workingsize = ceil(self.channelcount * self.bitdepth / 8)
-            filtered = bytearray()
+        if self.__data_dirty and self.__dirty_range is not None:
+            self.__data = self.__refilter_range(*self.__dirty_range)
+            self.__dirty_range = None
+            self.__data_dirty = False
+        elif self.__data_dirty:
+            filtertype = self.filtertype
+            unfiltered = self.unfiltered
 
-            if self.__filtertype == 0:
-                filtered = self.__unfiltered
+            if filtertype == 0:
+                filtered = unfiltered
             else:
-                for index, byte in enumerate(self.unfiltered):
-
-                    # b or c will be set to 0 if not required by the filtertype
-                    # This is done to avoid unneded computation,
-                    # as they require the previous scanline to be also decoded
-                    if index < workingsize:
-                        a = 0
-                    else:
-                        a = self.unfiltered[index - workingsize]
-                    if self._previous is None or self.filtertype not in (2, 3, 4):
-                        b = 0
-                    else:
-                        b = self._previous.unfiltered[index]
-                    if index < workingsize or self._previous is None or self.filtertype != 4:
-                        c = 0
-                    else:
-                        c = self._previous.unfiltered[index - workingsize]
-
-                    if self.filtertype == 1:
-                        filtered.append((byte - a) % 256)
-                    elif self.filtertype == 2:
-                        filtered.append((byte - b) % 256)
-                    elif self.filtertype == 3:
-                        filtered.append((byte - floor((a + b) / 2)) % 256)
-                    elif self.filtertype == 4:
-                        filtered.append((byte - paeth(a, b, c)) % 256)
-                    else:
-                        raise UnsupportedFilterTypeException(code=self.filtertype)
-            self.__data = pack('B', self.filtertype) + bytes(filtered)
+                try:
+                    filter_ = _FILTERS[filtertype]
+                except KeyError:
+                    raise UnsupportedFilterTypeException(code=filtertype)
+                # The first scanline is filtered as if it followed a line of zeros.
+                # The Sub filter does not need the previous scanline,
+                # so it is not decoded to avoid unneeded computation
+                if self._previous is None or filtertype == 1:
+                    previous = bytes(len(unfiltered))
+                else:
+                    previous = self._previous.unfiltered
+                filtered = filter_(unfiltered, previous, self._bpp)
+            self.__data = bytes((self.filtertype,)) + filtered
         return self.__data
 
     @data.setter
@@ -976,6 +1307,79 @@ class ScanLine:
         self.__data = as_data(val)
         self.__filtertype_dirty = True
         self.__pixels_dirty = True
+        self.__unfiltered_dirty = True
+        self.__data_dirty = False
+        self.__dirty_range = None
+
+    def __refilter_range(self, first, last):
+        """Filters again the unfiltered bytes from first to last (excluded) into the current data.
+        With the Sub, Average and Paeth filters, the bytes of the next pixel depend on the changed ones,
+        and the filter is given the pixel before the range as left neighbours."""
+        filtertype = self.filtertype
+        unfiltered = self.unfiltered
+        data = self.__data
+        if filtertype == 0:
+            return data[:1 + first] + unfiltered[first:last] + data[1 + last:]
+        try:
+            filter_ = _FILTERS[filtertype]
+        except KeyError:
+            raise UnsupportedFilterTypeException(code=filtertype)
+        bpp = self._bpp
+        start = max(0, first - bpp)
+        end = min(len(unfiltered), last + bpp)
+        if self._previous is None or filtertype == 1:
+            previous = bytes(end - start)
+        else:
+            previous = self._previous.unfiltered[start:end]
+        filtered = filter_(unfiltered[start:end], previous, bpp)
+        return data[:1 + first] + bytes(filtered[first - start:]) + data[1 + end:]
+
+
+# Filter functions, indexed by filter type
+_FILTERS = {
+    1: filter_sub,
+    2: filter_up,
+    3: filter_average,
+    4: filter_paeth,
+}
+
+# Reverse filter functions, indexed by filter type
+_UNFILTERS = {
+    1: unfilter_sub,
+    2: unfilter_up,
+    3: unfilter_average,
+    4: unfilter_paeth,
+}
+
+def unfilter_image(data: _Data, stride: int, bpp: int) -> list[bytes]:
+    """
+    Reverses the filters of all the scanlines of an image in a single pass,
+    each scanline being reconstructed from the one decoded just before it.
+
+    :param data: the image data, made of consecutive filtered scanlines, each one starting with its filter type byte.
+    :param stride: the length of an unfiltered scanline, in bytes.
+    :param bpp: the number of bytes per complete pixel, rounded up to one.
+    :returns: the unfiltered scanlines, without their filter type byte.
+        Trailing bytes that do not make a complete scanline are ignored.
+    :raises UnsupportedFilterTypeException: if a scanline uses an unknown filter type.
+    """
+    linesize = stride + 1
+    # The first scanline is reconstructed as if it followed a line of zeros
+    previous = bytes(stride)
+    lines = []
+    for start in range(0, len(data) - linesize + 1, linesize):
+        filtertype = data[start]
+        line = data[start + 1:start + linesize]
+        if filtertype == 0:
+            previous = bytes(line)
+        else:
+            try:
+                unfilter = _UNFILTERS[filtertype]
+            except KeyError:
+                raise UnsupportedFilterTypeException(code=filtertype)
+            previous = bytes(unfilter(line, previous, bpp))
+        lines.append(previous)
+    return lines
 
 
 _supported_chunks = chunks.implementations  # Just making a local reference for easier access
@@ -990,9 +1394,11 @@ def open(filename, ignore_signature=False):
     """
     data = None
     if filename.startswith('http://') or filename.startswith('https://'):
+        # Only imported when needed, as it takes a while to load and most images are read from disk
+        import requests
         data = requests.get(filename).content
     else:
-        with __builtins__['open'](filename, 'rb') as f:
+        with _builtin_open(filename, 'rb') as f:
             data = f.read()
     if data is not None:
         return Png(data, ignore_signature=ignore_signature)
@@ -1001,7 +1407,22 @@ def open(filename, ignore_signature=False):
 
 
 def read_png_signature(data):
-    return data[0:8] == _PNG_SIGNATURE
+    return data.startswith(_PNG_SIGNATURE)
+
+
+def read_dimensions(data: _Data) -> tuple[int, int]:
+    """
+    Reads the dimensions of a PNG image directly from its raw bytes,
+    without decoding its chunks.
+    This relies on the IHDR chunk being the first chunk in the file, as mandated by the PNG specification.
+
+    :param data: the raw bytes of a PNG file, starting with the PNG signature.
+    :returns: the size of the image, as a (width, height) tuple.
+    :raises InvalidPngStructureException: if the file does not start with an IHDR chunk.
+    """
+    if data[12:16] != b'IHDR' or len(data) < 24:
+        raise InvalidPngStructureException('missing IHDR chunk at the beginning of the file')
+    return _IHDR_DIMENSIONS.unpack_from(data, 16)
 
 
 def create_empty_chunk(t, realy_empty=False):
@@ -1026,5 +1447,5 @@ def create_empty_png():
     ihdr = create_empty_chunk('IHDR')
     iend = create_empty_chunk('IEND')
     idat = create_empty_chunk('IDAT')
-    data = _PNG_SIGNATURE + ihdr.bytes + idat.bytes + iend.bytes
+    data = b''.join((_PNG_SIGNATURE, ihdr.bytes, idat.bytes, iend.bytes))
     return Png(data)
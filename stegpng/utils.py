@@ -1,49 +1,221 @@
 import zlib
+from functools import lru_cache
 from typing import Union, get_args
 
 #TODO If the data to be compressed contain 16384 bytes or fewer, the PNG encoder may set the window size by rounding up to a power of 2 (256 minimum). This decreases the memory required for both encoding and decoding, without adversely affecting the compression ratio.
 
 Data = Union[bytes, bytearray]
+# The types of Data, usable with isinstance, resolved once as as_data is called on every constructor and setter
+_DATA_TYPES = get_args(Data)
 
-def compress(data):
+def compress(data, level=6):
+    """Compresses data into a zlib stream.
+    Small inputs are compressed with the smallest window that covers them,
+    which lowers the memory needed to decompress them without affecting the compression ratio.
+    The default level is zlib's own default, higher ones are much slower for a marginally smaller output."""
     if len(data) <= 16384:
         window_size = 8
         p = 256
         while len(data) > p:
             window_size += 1
             p <<= 1
-        compressor = zlib.compressobj(level=8, wbits=window_size)
-        b = bytearray(compressor.compress(data))
-        b.extend(compressor.flush())
-        return b
+        compressor = zlib.compressobj(level=level, wbits=window_size)
+        return compressor.compress(data) + compressor.flush()
     else:
-        return zlib.compress(data)
+        return zlib.compress(data, level)
 
 
-def decompress(data):
-    return zlib.decompress(data)
+# Deflate cannot expand data by more than this ratio, used to bound output size hints
+MAX_DEFLATE_RATIO = 1032
+
+
+def decompress(data, size_hint=None):
+    """Decompresses a zlib stream.
+    If the size of the decompressed data is known in advance, passing it as size_hint allows the output
+    buffer to be allocated once. The hint is bounded by what the stream could possibly expand to,
+    so a bogus value cannot trigger a huge allocation."""
+    if size_hint is None:
+        return zlib.decompress(data)
+    bufsize = max(1, min(size_hint, len(data) * MAX_DEFLATE_RATIO))
+    return zlib.decompress(data, bufsize=bufsize)
+
+
+def decompress_parts(parts):
+    """Decompresses a zlib stream split across several byte strings, without joining them first.
+    Raises zlib.error if the stream is truncated, like decompress does."""
+    decompressor = zlib.decompressobj()
+    out = [decompressor.decompress(part) for part in parts]
+    out.append(decompressor.flush())
+    if not decompressor.eof:
+        raise zlib.error('Error -5 while decompressing data: incomplete or truncated stream')
+    return b''.join(out)
 
 
 def paeth(a, b, c):
     """Implements the basic PAETH algorithm used to encode scanlines.
+    The predictor closest to p = a + b - c is picked by comparing the smallest and largest of a and b to 3c - a - b,
+    which selects the same byte as the predictor described in the PNG documentation with fewer operations.
     See the PNG documentation: https://www.w3.org/TR/PNG/#9Filter-type-4-Paeth"""
-    p = a + b - c
-    pa = abs(p - a)
-    pb = abs(p - b)
-    pc = abs(p - c)
-    if pa <= pb and pa <= pc:
-        Pr = a
-    elif pb <= pc:
-        Pr = b
+    if a < b:
+        lo, hi = a, b
     else:
-        Pr = c
-    return Pr
+        lo, hi = b, a
+    threshold = 3 * c - a - b
+    if hi <= threshold:
+        return lo
+    if threshold <= lo:
+        return hi
+    return c
+
+
+@lru_cache(maxsize=8)
+def _byte_lane_masks(length):
+    """Returns integer masks selecting the low seven bits and the high bit of each byte of a length bytes integer."""
+    return int.from_bytes(b'\x7f' * length, 'big'), int.from_bytes(b'\x80' * length, 'big')
+
+
+# The reverse filter functions take a filtered line without its filter type byte,
+# the unfiltered line above it (all zeros for the first line of an image), and the number of bytes per pixel
+def unfilter_sub(line, previous, bpp):
+    """Reverses the Sub filter: each byte is added to the reconstructed byte bpp positions before it.
+    The whole line is handled as a single integer, with the carries kept from crossing byte boundaries.
+    Each step adds the line shifted by twice as many pixels as the step before,
+    so every byte has received all the bytes to its left in its channel after a logarithmic number of steps.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    length = len(line)
+    low, high = _byte_lane_masks(length)
+    total = int.from_bytes(line, 'big')
+    shift = 8 * bpp
+    while shift < 8 * length:
+        shifted = total >> shift
+        total = ((total & low) + (shifted & low)) ^ ((total ^ shifted) & high)
+        shift <<= 1
+    return bytearray(total.to_bytes(length, 'big'))
+
+
+def unfilter_up(line, previous, bpp):
+    """Reverses the Up filter: each byte is added to the byte above it.
+    The whole line is added at once as a single integer, with the carries kept from crossing byte boundaries.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    length = len(line)
+    low, high = _byte_lane_masks(length)
+    x = int.from_bytes(line, 'big')
+    y = int.from_bytes(previous, 'big')
+    total = ((x & low) + (y & low)) ^ ((x ^ y) & high)
+    return bytearray(total.to_bytes(length, 'big'))
+
+
+def unfilter_average(line, previous, bpp):
+    """Reverses the Average filter: each byte is added to the mean of the reconstructed byte bpp positions before it
+    and of the byte above it.
+    The bytes bpp positions apart form independent recurrences, each one is reconstructed in a single pass.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    unfiltered = bytearray(line)
+    for lane in range(bpp):
+        reconstructed = []
+        append = reconstructed.append
+        # The first pixel has no left neighbour, which is the same as having a zero one
+        a = 0
+        for byte, b in zip(line[lane::bpp], previous[lane::bpp]):
+            # The mean is rounded down, see https://www.w3.org/TR/PNG/#9Filter-type-3-Average
+            a = (byte + ((a + b) >> 1)) & 255
+            append(a)
+        unfiltered[lane::bpp] = bytes(reconstructed)
+    return unfiltered
+
+
+def unfilter_paeth(line, previous, bpp):
+    """Reverses the Paeth filter, using the reconstructed byte bpp positions before each byte,
+    the byte above it and the byte above that one as predictors.
+    The bytes bpp positions apart form independent recurrences, each one is reconstructed in a single pass.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    unfiltered = bytearray(line)
+    for lane in range(bpp):
+        reconstructed = []
+        append = reconstructed.append
+        # The first pixel has no left neighbours, which is the same as having zero ones
+        a = c = 0
+        for byte, b in zip(line[lane::bpp], previous[lane::bpp]):
+            # Same as paeth(a, b, c), inlined as this is called for every byte of the image
+            if a < b:
+                lo, hi = a, b
+            else:
+                lo, hi = b, a
+            threshold = 3 * c - a - b
+            if hi <= threshold:
+                a = (byte + lo) & 255
+            elif threshold <= lo:
+                a = (byte + hi) & 255
+            else:
+                a = (byte + c) & 255
+            c = b
+            append(a)
+        unfiltered[lane::bpp] = bytes(reconstructed)
+    return unfiltered
+
+
+# The filter functions take an unfiltered line, the unfiltered line above it (all zeros for the first line of an image),
+# and the number of bytes per pixel, and return the filtered line without its filter type byte
+def _subtract_lanes(x, y, length):
+    """Subtracts each byte of the length bytes integer y from the matching byte of x, modulo 256,
+    with the borrows kept from crossing byte boundaries."""
+    low, high = _byte_lane_masks(length)
+    return (((x | high) - (y & low)) ^ ((x ^ ~y) & high)).to_bytes(length, 'big')
+
+
+def filter_sub(line, previous, bpp):
+    """Applies the Sub filter: each byte is subtracted the byte bpp positions before it.
+    The whole line is subtracted at once as a single integer, shifted by one pixel.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    x = int.from_bytes(line, 'big')
+    return _subtract_lanes(x, x >> (8 * bpp), len(line))
+
+
+def filter_up(line, previous, bpp):
+    """Applies the Up filter: each byte is subtracted the byte above it.
+    The whole line is subtracted at once as a single integer.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    return _subtract_lanes(int.from_bytes(line, 'big'), int.from_bytes(previous, 'big'), len(line))
+
+
+def filter_average(line, previous, bpp):
+    """Applies the Average filter: each byte is subtracted the mean of the byte bpp positions before it
+    and of the byte above it.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    # The first pixel has no left neighbour, which is the same as having a zero one
+    left = bytes(min(bpp, len(line))) + line[:-bpp]
+    return bytes((byte - ((a + b) >> 1)) & 255 for byte, a, b in zip(line, left, previous))
+
+
+def filter_paeth(line, previous, bpp):
+    """Applies the Paeth filter, subtracting the predictor picked among the byte bpp positions before each byte,
+    the byte above it and the byte above that one.
+    See https://www.w3.org/TR/PNG/#9Filter-types"""
+    # The first pixel has no left neighbours, which is the same as having zero ones
+    padding = bytes(min(bpp, len(line)))
+    left = padding + line[:-bpp]
+    upper_left = padding + previous[:-bpp]
+    filtered = bytearray(len(line))
+    for index, byte, a, b, c in zip(range(len(line)), line, left, previous, upper_left):
+        # Same as paeth(a, b, c), inlined as this is called for every byte of the image
+        if a < b:
+            lo, hi = a, b
+        else:
+            lo, hi = b, a
+        threshold = 3 * c - a - b
+        if hi <= threshold:
+            filtered[index] = (byte - lo) & 255
+        elif threshold <= lo:
+            filtered[index] = (byte - hi) & 255
+        else:
+            filtered[index] = (byte - c) & 255
+    return filtered
 
 
 def as_data(data: Data):
-    if not isinstance(data, get_args(Data)):
-        types = " or ".join(get_args(Data))
+    if type(data) is bytes:
+        return data
+    if not isinstance(data, _DATA_TYPES):
+        types = " or ".join(t.__name__ for t in _DATA_TYPES)
         raise TypeError("Expected {}, not {}".format(types, type(data)))
-    if not isinstance(data, bytes):
-        data = bytes(data)
-    return data
+    return bytes(data)
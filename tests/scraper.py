@@ -4,10 +4,13 @@ from requests import Session
 from urllib.parse import urljoin, quote as url_encode
 from sys import argv
 from bs4 import BeautifulSoup as Soup
-import magic
-from os import listdir, walk
-from os.path import isfile, getsize
+from os import listdir, scandir, remove, replace
+from os.path import isfile
 from time import strftime
+import re
+from threading import Lock, Event
+from hashlib import sha1
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 sess = Session()
@@ -18,6 +21,8 @@ proxies = {
 
 
 visited = set()
+log_lock = Lock()
+stopping = Event() #Set when the scraper stops, to abandon the downloads still running
 logname = None
 logfile = None
 req_count = 0
@@ -25,6 +30,10 @@ data_size = 0
 
 IMG_DIR = "test_files" #Where to save scraped files
 LOG_DIR = "scraperlogs"    #Where to save logs
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+IMG_WORKERS = 16 #How many images to download at once
+PNG_URL = re.compile(r'\.png(?:$|\?)', re.IGNORECASE)
 
 
 class VisitedException(Exception):
@@ -34,10 +43,14 @@ class VisitedException(Exception):
         super(VisitedException, self).__init__("Already visited {}".format(self.url))
 
 def get_directory_size(directory):
+    # scandir entries come with their stat information, so files are not stat'ed a second time
     size = 0
-    for cdir, dirlist, flist in walk(directory):
-        for f in flist:
-            size += getsize(cdir + '/' + f)
+    with scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                size += get_directory_size(entry.path)
+            elif entry.is_file():
+                size += entry.stat().st_size
     return size
 
 def format_size2human(size, is_units=False):
@@ -97,16 +110,71 @@ def has_visited(url):
     return url in visited
 
 
-def request(url):
+def request(url, stream=False):
     global req_count
     if has_visited(url):
         raise VisitedException(url)
-    resp = sess.get(url, proxies=proxies)
-    logfile.write(url + "\n")
-    req_count += 1
+    resp = sess.get(url, proxies=proxies, stream=stream)
+    # Images are fetched from worker threads
+    with log_lock:
+        logfile.write(url + "\n")
+        req_count += 1
     return resp
 
 
+def fetch_image(img_url):
+    """
+    Downloads an image and saves it if it is a PNG.
+
+    :returns: the number of bytes written, or None if nothing was saved
+    """
+    try:
+        resp = request(img_url, stream=True)
+        visited.add(img_url)
+    except VisitedException:
+        return None
+    except Exception as e:
+        print("Failed to download URL ({}): {}".format(e, img_url))
+        return None
+
+    # Images are streamed to disk, only the signature is looked at before deciding to keep them
+    partname = None
+    with resp:
+        try:
+            content = resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+            head = b''
+            for block in content:
+                head += block
+                if len(head) >= len(PNG_SIGNATURE):
+                    break
+            if not head.startswith(PNG_SIGNATURE):
+                return None
+            savename = img_url.replace('/', '-').replace(':', '-')
+            savename = savename[:50]
+            # Images of the same page often share the first characters of their URL and are downloaded at the same time,
+            # a hash of the full URL keeps them from writing to the same file
+            savename = '{}/new/{}-{}.png'.format(IMG_DIR, savename, sha1(img_url.encode()).hexdigest()[:12])
+            # The image is written under a temporary name and only renamed once complete,
+            # an interrupted download must not be left behind as a truncated PNG
+            partname = savename + '.part'
+            size = len(head)
+            with open(partname, 'wb') as f:
+                f.write(head)
+                for block in content:
+                    if stopping.is_set():
+                        raise InterruptedError("the scraper stopped")
+                    f.write(block)
+                    size += len(block)
+            replace(partname, savename)
+        except Exception as e:
+            if not stopping.is_set():
+                print("Failed to download URL ({}): {}".format(e, img_url))
+            if partname is not None and isfile(partname):
+                remove(partname)
+            return None
+    return size
+
+
 def scrap(starturl, limit):
     
     global data_size
@@ -129,70 +197,59 @@ def scrap(starturl, limit):
             end="\r"
         )
 
-    while len(queue) > 0 and data_size < limit:
+    executor = ThreadPoolExecutor(max_workers=IMG_WORKERS)
+    try:
+        while len(queue) > 0 and data_size < limit:
 
-        url = queue.pop()
+            url = queue.pop()
 
-        # Get new URLs (from <a> href tags only)
-        try:
-            resp = request(url)
-        except VisitedException:
-            continue
-        except Exception as e:
-            print("Failed to download URL ({}): {}".format(e, img_url))
-            continue
-        try:
-            soup = Soup(resp.text, 'html.parser')
-            links = [l.get('href', None) for l in soup.find_all('a')]
-            links = set(map(lambda l: urljoin(url, l), links)) #Make relative links absolute
-            # Remove the already visited links from the new one
-            links.difference_update(visited)
-            queue.update(links)
-        except Exception as e:
-            print("Failed ({}) to parse page at {}".format(e, url))
-            continue
-
-        # Get image URLs from <img> tags
-        imgs = [l.get('src', '') for l in soup.find_all('img')]
-        imgs = set(filter(lambda l: l.endswith('.png'), map(lambda l: urljoin(url, l), imgs)))
-        imgs.difference_update(visited)
-        for img_url in imgs:
-            if has_visited(img_url):
-                continue
+            # Get new URLs (from <a> href tags only)
             try:
-                resp = request(img_url).content
-                visited.add(img_url)
+                resp = request(url)
             except VisitedException:
                 continue
             except Exception as e:
-                print("Failed to download URL ({}): {}".format(e, img_url))
+                print("Failed to download URL ({}): {}".format(e, url))
                 continue
-                
-            if not magic.detect_from_content(resp).mime_type == 'image/png':
+            try:
+                soup = Soup(resp.text, 'lxml')
+                links = {urljoin(url, l.get('href', None)) for l in soup.find_all('a')} #Make relative links absolute
+                # Remove the already visited links from the new one
+                links.difference_update(visited)
+                queue.update(links)
+            except Exception as e:
+                print("Failed ({}) to parse page at {}".format(e, url))
                 continue
-                
-            savename = img_url.replace('/', '-').replace(':', '-')
-            savename = savename[:50]
-            savename = '{}/new/{}.png'.format(IMG_DIR, savename)
-            with open(savename, 'wb') as f:
-                f.write(resp)
-            if img_count % 20 == 0:
-                print("Recalculating the amount of the data we already have...         ", end='\r')
-                data_size = get_directory_size(IMG_DIR)
-            else:
-                data_size += len(resp)
-            img_count += 1
+
+            # Get image URLs from <img> tags
+            imgs = {l for l in (urljoin(url, i.get('src', '')) for i in soup.find_all('img')) if PNG_URL.search(l)}
+            imgs.difference_update(visited)
+            # The images of a page are downloaded concurrently, the requests spend most of their time waiting
+            futures = [executor.submit(fetch_image, img_url) for img_url in imgs]
+            for future in as_completed(futures):
+                size = future.result()
+                if size is None:
+                    continue
+                # The directory is only measured once in load(), rescanning it while scraping gets slower as it grows
+                data_size += size
+                img_count += 1
+                print_stats()
+                if data_size >= limit:
+                    print("Downloaded enough data!")
+                    return
+            visited_count += 1
             print_stats()
-            if data_size >= limit:
-                print("Downloaded enough data!")
-                return
-        visited_count += 1
-        print_stats()
-        visited.add(url)
+            visited.add(url)
 
 
-    else:
-        print("Nothing to spider! (Was your starting url valid?)")
+        else:
+            print("Nothing to spider! (Was your starting url valid?)")
+    finally:
+        # Leaving the executor's with block would wait for every running download, which blocked Ctrl-C.
+        # The downloads still running are abandoned instead, their size is never counted in data_size
+        stopping.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 if __name__ == '__main__':
     if len(argv) != 3:
@@ -10,11 +10,8 @@ width, height = img1.size
 img2 = Image.new('RGBA', img1.size)
 
 st = time()
-for x in range(width):
-    for y in range(height):
-        #print((x, y))
-        pixel = img1.getpixel((x, y))
-        img2.putpixel((x, y), pixel)
+# The whole image is decoded and copied at once, instead of going through getpixel and putpixel for every pixel
+img2.putdata([pixel for row in img1.pixels for pixel in row])
 l = time() - st
 
 print('{} s; {} ms/pixel'.format(l, (l*1000/(width*height))))
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import stegpng
+
+
+def test_text_fields():
+    chunk = stegpng.create_empty_chunk('tEXt')
+    chunk.data = b'Title\x00Hello'
+    assert chunk.get_payload() == {'keyword': 'Title', 'text': 'Hello'}
+    assert chunk['keyword'] == 'Title'
+    assert chunk['text'] == 'Hello'
+
+    chunk.setitem('text', 'World')
+    assert chunk.data == b'Title\x00World'
+    chunk.setitem('keyword', 'Author')
+    assert chunk.data == b'Author\x00World'
+
+    reread = stegpng.PngChunk(chunk.bytes)
+    assert reread.check_crc()
+    assert reread.get_payload() == {'keyword': 'Author', 'text': 'World'}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import pytest
+
+import stegpng
+from test_scanline import HEIGHT, ROWS, WIDTH, make_png
+
+
+def test_chunk_addresses_after_reset():
+    img = stegpng.create_empty_png()
+    assert [img.address_of_chunk(chunk) for chunk in img.chunks] == [8, 33, 45]
+    img.reset()
+    # The chunks read again are new objects, the addresses of the previous ones must not be used for them
+    assert [img.address_of_chunk(chunk) for chunk in img.chunks] == [8, 33, 45]
+
+
+@pytest.mark.parametrize('removed, expected', [
+    (('IDAT',), ['IHDR', 'IDAT', 'IEND']),
+    (('IDAT', 'IEND'), ['IHDR', 'IDAT']),
+])
+def test_set_imagedata_without_idat(removed, expected):
+    img = stegpng.Png(make_png(0))
+    img.chunks[:] = [chunk for chunk in img.chunks if chunk.type not in removed]
+    data = b''.join(b'\x00' + bytes(range(y, y + WIDTH * 3)) for y in range(HEIGHT))
+    img.imagedata = data
+    assert [chunk.type for chunk in img.chunks] == expected
+
+    reread = stegpng.Png(img.bytes)
+    assert [chunk.type for chunk in reread.chunks] == expected
+    assert reread.imagedata == data
+    assert reread.getpixel((1, 2)) == (5, 6, 7)
+
+
+def test_getpixel_checks_changed_ihdr():
+    img = stegpng.Png(make_png(0))
+    assert img.getpixel((1, 2)) == tuple(ROWS[2][3:6])
+    img.chunks[0]['interlace'] = 1
+    with pytest.raises(stegpng.InvalidPngStructureException):
+        img.scanlines
+    with pytest.raises(stegpng.InvalidPngStructureException):
+        img.getpixel((1, 2))
+
+
+def test_chunk_indexes_follow_chunk_changes():
+    img = stegpng.Png(make_png(0))
+    other = stegpng.Png(make_png(0))
+    idats = other.get_chunks_by_type('IDAT')
+    addresses = [other.address_of_chunk(chunk) for chunk in other.chunks]
+    assert len(img.get_chunks_by_type('IDAT')) == 1
+    assert img.address_of_chunk(img.chunks[2]) == addresses[2]
+
+    idat = img.chunks[1]
+    idat.data = idat.data + b'\x00'
+    assert img.address_of_chunk(img.chunks[2]) == addresses[2] + 1
+    idat.type = 'abCD'
+    assert img.get_chunks_by_type('IDAT') == ()
+    assert img.get_chunks_by_type('abCD') == (idat,)
+    # The indexes of another image are not affected by the changes made to this one
+    assert other.get_chunks_by_type('IDAT') is idats
+    assert [other.address_of_chunk(chunk) for chunk in other.chunks] == addresses
+
+
+@pytest.mark.parametrize('ctype, critical', [
+    ('IHDR', True),
+    ('PLTE', True),
+    ('IDAT', True),
+    ('IEND', True),
+    ('pHYs', False),
+    ('sRGB', False),
+    ('tEXt', False),
+    ('gAMA', False),
+])
+def test_critical_chunks(ctype, critical):
+    # The critical bit is bit 5 of the first byte of the type, an uppercase first letter
+    chunk = stegpng.create_empty_chunk(ctype, realy_empty=True)
+    assert chunk.iscritical() == critical
+    assert chunk.isancillary() != critical
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+from struct import pack
+from zlib import compress, crc32
+
+import pytest
+
+import stegpng
+
+WIDTH, HEIGHT = 5, 4
+ROWS = [bytes((31 * x + 17 * y + 7) & 255 for x in range(WIDTH * 3)) for y in range(HEIGHT)]
+
+
+def make_png(filtertype):
+    """Builds an 8 bits RGB image from ROWS, with every scanline using the given filter type."""
+    data = b''
+    previous = bytes(WIDTH * 3)
+    for row in ROWS:
+        line = stegpng.png._FILTERS[filtertype](row, previous, 3) if filtertype else row
+        data += bytes([filtertype]) + bytes(line)
+        previous = row
+    chunks = (
+        (b'IHDR', pack('>IIBBBBB', WIDTH, HEIGHT, 8, 2, 0, 0, 0)),
+        (b'IDAT', compress(data)),
+        (b'IEND', b''),
+    )
+    return b'\x89PNG\r\n\x1a\n' + b''.join(
+        pack('>I', len(payload)) + ctype + payload + pack('>I', crc32(ctype + payload)) for ctype, payload in chunks
+    )
+
+
+@pytest.mark.parametrize('filtertype', range(5))
+def test_edit_pixel_through_scanlines(filtertype):
+    img = stegpng.Png(make_png(filtertype))
+    # The last scanline is edited, no scanline below it is filtered against the old pixels
+    scanline = img.scanlines[-1]
+    pixels = list(scanline.pixels)
+    pixels[2] = (1, 2, 3)
+    scanline.pixels = pixels
+    assert scanline.filtertype == filtertype
+    img.recalculate_image_data()
+
+    reread = stegpng.Png(img.bytes)
+    assert reread.getpixel((2, HEIGHT - 1)) == (1, 2, 3)
+    assert reread.scanlines[-1].filtertype == filtertype
+    for y, row in enumerate(ROWS):
+        for x in range(WIDTH):
+            if (x, y) != (2, HEIGHT - 1):
+                assert reread.getpixel((x, y)) == tuple(row[3 * x:3 * x + 3])
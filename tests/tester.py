@@ -2,16 +2,29 @@
 
 import stegpng
 from sys import argv
-from os import remove, rename, walk, listdir
+from os import remove, rename, scandir, stat
+from os.path import basename, join, dirname
 from PIL import Image
 import io
-from time import time
+from time import perf_counter
+from collections import Counter
+from struct import Struct
+from zlib import crc32
+from functools import partial
+from multiprocessing import Pool
+from hashlib import blake2b
+from glob import glob
+import shelve
 
 IMG_DIR = "test_files"
 FIN_DIR = IMG_DIR + "/fine"
 NEW_DIR = IMG_DIR + "/new"
 ERR_DIR = IMG_DIR + "/error"
 CRA_DIR = IMG_DIR + "/crashers"
+CACHE_FILE = "tester_cache" #Where to keep the results of previous runs
+PROGRESS_INTERVAL = 64 #How many files to analyse between progress updates
+
+U32 = Struct('>I')
 
 class UnknownChunkException(Exception):
 
@@ -24,8 +37,52 @@ def printimg(img):
     print(img.pixels)
 
 def move2new(directory):
-    for fname in listdir(directory):
-        rename(directory + "/" + fname, NEW_DIR + "/" + fname)
+    with scandir(directory) as entries:
+        for entry in entries:
+            rename(entry.path, join(NEW_DIR, entry.name))
+
+def list_files(directory):
+    """
+    Lists the files in a directory and its sub-directories.
+    scandir already knows the type of each entry, so nothing has to be stat'ed.
+
+    :returns: the paths of the files
+    """
+    fnames = []
+    directories = [directory]
+    while directories:
+        with scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file():
+                    fnames.append(entry.path)
+    return fnames
+
+def find_bad_crcs(imgbytes):
+    """
+    Checks the CRC of every chunk directly in the file's bytes, the same way stegpng splits them.
+
+    :returns: the indexes of the chunks which CRC does not match their content
+    """
+    view = memoryview(imgbytes)
+    bad_crcs = set()
+    start = 8
+    index = 0
+    while start + 8 <= len(view):
+        length = U32.unpack_from(view, start)[0]
+        end = start + length + 8
+        if end + 4 > len(view):
+            # Truncated chunk, there is no CRC to compare to
+            bad_crcs.add(index)
+            break
+        if crc32(view[start + 4:end]) != U32.unpack_from(view, end)[0]:
+            bad_crcs.add(index)
+        if view[start + 4:start + 8] == b'IEND':
+            break
+        start = end + 4
+        index += 1
+    return bad_crcs
 
 def test_img(imgbytes, catch=True, quick=False):
     unsupported_chunks = set()
@@ -34,73 +91,140 @@ def test_img(imgbytes, catch=True, quick=False):
     modified = False
     try:
         img = stegpng.Png(imgbytes)
-        pilimg = Image.open(io.BytesIO(imgbytes))
-        
-        pilwidth, pilheight = pilimg.size
         width, height = img.size
-        
-        if pilwidth != width:
-            raise Exception('widths does not match')
-        if pilheight != height:
-            raise Exception('heights does not match')
-
-        plt = []
-        if pilimg.mode == 'P':
-            p = pilimg.getpalette()
-            for i in range(0, len(p), 3):
-                plt.append((p[i], p[i+1], p[i+2]))
-
-        for chunk in img.chunks:
+        # Quick tests only look at the chunks, the image is not decoded by PIL
+        if not quick:
+            pilimg = Image.open(io.BytesIO(imgbytes))
+
+            pilwidth, pilheight = pilimg.size
+
+            if pilwidth != width:
+                raise Exception('widths does not match')
+            if pilheight != height:
+                raise Exception('heights does not match')
+
+            plt = []
+            if pilimg.mode == 'P':
+                # The palette is a flat list of channels, each entry is made of 3 consecutive values
+                p = iter(pilimg.getpalette())
+                plt = list(zip(p, p, p))
+
+        # The CRCs are verified in a single pass over the file, only the chunks with a wrong one are updated
+        bad_crcs = find_bad_crcs(imgbytes)
+        # Edited chunks are compared to their bytes in the file, the others are never serialized again
+        view = memoryview(imgbytes)
+        end = 8
+        chunks = img.chunks
+        ihdr = chunks[0]
+        for index, chunk in enumerate(chunks):
+            ctype = chunk.type
+            start = end
+            end += chunk.size
             if not chunk.is_supported():
-                unsupported_chunks.add(chunk.type)
+                unsupported_chunks.add(ctype)
                 if quick:
                     raise UnknownChunkException(chunk)
                 continue
-            original_bytes = chunk.bytes
-            chunk.type = chunk.type
+            chunk.type = ctype
+            # Reassigning the type only changes the bytes when it fixes a wrong CRC,
+            # otherwise the chunk's version tells whether anything below edited it
+            original_version = chunk._version
             chunk.iscritical()
             chunk.isancillary()
-            if not chunk.is_valid() and not chunk.type == 'IDAT':
+            if not chunk.is_valid() and not ctype == 'IDAT':
                 invalid_chunks.append(chunk)
-            if chunk.check_crc:
+            if index in bad_crcs:
                 chunk.update_crc()
-            if chunk.type == 'PLTE':
+            if ctype == 'PLTE':
                 for i, val in enumerate(chunk.get_payload()):
                     chunk[i] = val
             else:
-                payload = chunk.get_payload(ihdr=img.chunks[0])
-                if type(payload) == dict:
+                payload = chunk.get_payload(ihdr=ihdr)
+                if isinstance(payload, dict):
                     for key, val in payload.items():
                         try:
-                            chunk.setitem(key, val, ihdr=img.chunks[0])
+                            chunk.setitem(key, val, ihdr=ihdr)
                         except KeyError:
                             pass
-            if chunk.bytes != original_bytes:
+            edited = index in bad_crcs or chunk._version != original_version
+            if edited and chunk.bytes != view[start:end]:
                 modified = True
         chunk._set_empty_data()
         img.reset()
 
-        for y in range(height):
-            for x in range(width):
-                p1 = img.getpixel((x, y))
-                p2 = pilimg.getpixel((x, y))
-                if pilimg.mode == 'P':
-                    p2 = plt[p2]
-                if p1 != p2:
-                    raise Exception('pixels at {}:{} does not match: {}  and {}'.format(x, y, p1, p2))
+        if not quick:
+            # Both images are decoded in bulk and compared row by row, pixels are only looked at one by one on a mismatch
+            pilpixels = list(pilimg.getdata())
+            if pilimg.mode == 'P':
+                pilpixels = [plt[p] for p in pilpixels]
+            for y, row in enumerate(img.pixels):
+                pilrow = pilpixels[y * width:(y + 1) * width]
+                if list(row) != pilrow:
+                    x = next(x for x in range(width) if row[x] != pilrow[x])
+                    raise Exception('pixels at {}:{} does not match: {}  and {}'.format(x, y, row[x], pilrow[x]))
 
-        img.reset()
+            img.reset()
 
     except Exception as e:
         if not catch:
             raise e
         else:
-            if type(e) == UnknownChunkException:
+            if isinstance(e, UnknownChunkException):
                 unsupported_chunks.add(e.chunk.type)
             else:
                 error = True
     return error, modified, tuple(invalid_chunks), unsupported_chunks
 
+def test_file(fname, quick=False):
+    """
+    Reads a file and runs test_img on its content, in a way that can be handed to a process pool.
+
+    :returns: the name of the file, followed by test_img's results, with the types of the invalid chunks
+        in place of the chunks themselves
+    """
+    with open(fname, 'rb') as f:
+        content = f.read()
+    error, modified, invalid, unsupported_chunks = test_img(content, quick=quick)
+    # Results go through the process pool and the cache, they only hold plain values rather than chunks
+    return fname, error, modified, tuple(chunk.type for chunk in invalid), unsupported_chunks
+
+def code_version():
+    """
+    :returns: a digest of stegpng's sources and of this script, which changes whenever test results could
+    """
+    digest = blake2b(digest_size=16)
+    for fname in sorted(glob(join(dirname(stegpng.__file__), '*.py'))) + [__file__]:
+        with open(fname, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def tested_files(fnames, quick=False):
+    """
+    Tests files in parallel, reusing the results of previous runs for the files that did not change,
+    as long as neither stegpng nor this script changed either.
+    Files are identified by name, size and modification time, so moving them around keeps their results.
+
+    :returns: an iterator over test_file's results, in no particular order
+    """
+    version = code_version()
+    # The cache is only used from this process, the workers just test files
+    with shelve.open(CACHE_FILE) as cache:
+        if cache.get('version') != version:
+            cache.clear()
+            cache['version'] = version
+        keys = {}
+        for fname in fnames:
+            st = stat(fname)
+            key = '{}:{}:{}:{}'.format(quick, basename(fname), st.st_size, st.st_mtime_ns)
+            if key in cache:
+                yield (fname,) + cache[key]
+            else:
+                keys[fname] = key
+        with Pool() as pool:
+            for result in pool.imap_unordered(partial(test_file, quick=quick), list(keys), chunksize=16):
+                cache[keys[result[0]]] = result[1:]
+                yield result
+
 def test():
     fname = argv[2]
     with open(fname, 'rb') as f:
@@ -114,23 +238,19 @@ def test():
     if modified:
         print("Test did not preserve image integrity...")
 
-def masstest(directory, movedir=(ERR_DIR, FIN_DIR)):
+def masstest(directory, movedir=(ERR_DIR, FIN_DIR), quick=False):
 
     for fromdir in movedir:
         print("Moving files from {} to {}... ".format(fromdir, directory), end='')
         move2new(fromdir)
         print("Done")
 
-    fnames = set()
-    for dirpath, dirs, files in walk(directory):
-        fnames.update(files)
+    paths = list_files(directory)
 
-    for fn in fnames:
-        fname = directory + '/' + fn
+    # Files are tested in parallel, but only moved from this process
+    for fname, errors, changed, invalid, unknown_chunks in tested_files(paths, quick=quick):
+        fn = basename(fname)
         print(fname)
-        with open(fname, 'rb') as f:
-            content = f.read()
-        errors, changed, invalid, unknown_chunks = test_img(content, quick=True)
         if errors:
             print("{} threw an exception".format(fname))
             rename(fname, ERR_DIR + '/' + fn)
@@ -145,47 +265,32 @@ def masstest(directory, movedir=(ERR_DIR, FIN_DIR)):
             rename(fname, FIN_DIR + '/' + fn)
 
 def stats():
-    chunks = {}
-    c = 0
+    chunks = Counter()
     exceptions = 0
     file_count = 0
     changed_count = 0
-    fnames = []
     print('Listing files...\r', end='')
-    for dirpath, dirs, files in walk(IMG_DIR):
-        for fn in files:
-            fname = dirpath + '/' + fn
-            fnames.append(fname)
+    fnames = list_files(IMG_DIR)
     print('Found {} files'.format(len(fnames)))
-    start_time = time()
-    for i, fname in enumerate(fnames):
-        fst = time()
-        avg_time = (fst - start_time)/(i+1)
-        remain_time = (len(fnames)-i)*avg_time
-        remain_hr = int(remain_time // 3600)
-        remain_time -= remain_hr * 3600
-        remain_mn = int(remain_time//60)
-        remain_time -= remain_mn*60
-        remain_sc = int(remain_time)
-        print('Analysed {}/{} files {}h{}mn{}s remaining           '.format(
-                i,
-                len(fnames),
-                remain_hr,
-                remain_mn,
-                remain_sc
-            ),
-            end='\r'
-        )
-        with open(fname, 'rb') as f:
-            content = f.read()
+    start_time = perf_counter()
+    # Files are independent from each other, so they are tested in parallel and counted as their results come in
+    for i, (fname, errors, changed, invalid, unknown_chunks) in enumerate(tested_files(fnames)):
+        # Printing progress for every file slows down large runs, it is only updated every few files
+        if i % PROGRESS_INTERVAL == 0 or i + 1 == len(fnames):
+            avg_time = (perf_counter() - start_time)/(i+1)
+            remain_mn, remain_sc = divmod(int((len(fnames)-i-1)*avg_time), 60)
+            remain_hr, remain_mn = divmod(remain_mn, 60)
+            print('Analysed {}/{} files {}h{}mn{}s remaining           '.format(
+                    i+1,
+                    len(fnames),
+                    remain_hr,
+                    remain_mn,
+                    remain_sc
+                ),
+                end='\r'
+            )
         file_count += 1
-        errors, changed, invalid, unknown_chunks = test_img(content)
-        for chunk in unknown_chunks:
-            c += 1
-            if chunk in chunks:
-                chunks[chunk] += 1
-            else:
-                chunks[chunk] = 1
+        chunks.update(unknown_chunks)
         if errors:
             exceptions += 1
         if changed:
@@ -194,10 +299,11 @@ def stats():
     print('{} files'.format(file_count))
     print('Exception: {}, {}%'.format(exceptions, int(exceptions*100/file_count)))
     print('Changed files: {}, {}%'.format(changed_count, int(changed_count*100/file_count)))
-    print('{} s/file'.format((time()-start_time)/file_count))
+    print('{} s/file'.format((perf_counter()-start_time)/file_count))
 
     print('Unknown chunks:')
-    for chunk, count in chunks.items():
+    c = sum(chunks.values())
+    for chunk, count in chunks.most_common():
         freq = count/c *100
         print('\t', chunk, count ,' \t', freq)
 
@@ -220,7 +326,7 @@ if __name__ == '__main__':
         elif argv[1] == 'errtest':
             masstest(ERR_DIR, movedir=())
         elif argv[1] == 'quicktest':
-            masstest(NEW_DIR, movedir=())
+            masstest(NEW_DIR, movedir=(), quick=True)
         elif argv[1] == 'stats':
             stats()
         elif argv[1] == 'print':